@@ -0,0 +1,107 @@
+"""
+Cachés locales en memoria (por proceso) con TTL e invalidación por espacio de nombres.
+
+Cada caché se registra bajo un namespace (ej: "users"). Las escrituras
+llaman a `invalidate(namespace, keys)` y todas las cachés registradas en
+ese namespace descartan las claves afectadas (o todo si keys es None).
+Las cachés cuyas claves no son filas (`per_row=False`, ej: totales por
+filtro) se vacían completas ante cualquier invalidación del namespace.
+
+Entre workers, las invalidaciones llegan por LISTEN/NOTIFY
+(app.core.invalidation). Mientras ese canal está caído las cachés quedan
+suspendidas (`set_coherent(False)`): toda lectura es un miss y no se guarda
+nada, para no servir datos que otro worker ya cambió.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+
+class TTLCache:
+    """
+    Caché LRU con expiración por entrada.
+    No es compartida entre workers: cada proceso mantiene la suya.
+    Con `per_row=False` las claves no identifican filas del namespace, así
+    que cualquier cambio en él invalida la caché completa.
+    """
+
+    def __init__(self, namespace: str, ttl: float, maxsize: int = 10000, per_row: bool = True):
+        self.namespace = namespace
+        self.per_row = per_row
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if not _coherent:
+            return default
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if not _coherent:
+            return
+        self._data[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, keys: Optional[Iterable[Hashable]] = None) -> None:
+        """Elimina las claves indicadas, o toda la caché si keys es None."""
+        if keys is None:
+            self._data.clear()
+            return
+        for key in keys:
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# ======================
+# Registro global
+# ======================
+_registry: Dict[str, List[TTLCache]] = {}
+_coherent = True
+
+
+def register_cache(cache: TTLCache) -> TTLCache:
+    """Registra una caché para que reciba las invalidaciones de su namespace."""
+    _registry.setdefault(cache.namespace, []).append(cache)
+    return cache
+
+
+def invalidate(namespace: str, keys: Optional[Iterable[Hashable]] = None) -> None:
+    """Invalida claves (o todo) en todas las cachés del namespace."""
+    keys = list(keys) if keys is not None else None
+    for cache in _registry.get(namespace, []):
+        cache.invalidate(keys if cache.per_row else None)
+
+
+def clear_all() -> None:
+    """Vacía todas las cachés registradas."""
+    for caches in _registry.values():
+        for cache in caches:
+            cache.invalidate()
+
+
+def set_coherent(coherent: bool) -> None:
+    """Suspende (False) o reanuda (True) todas las cachés; al suspender se vacían."""
+    global _coherent
+    if not coherent:
+        clear_all()
+    _coherent = coherent
+
+
+def is_coherent() -> bool:
+    return _coherent
+
+
+__all__ = ["TTLCache", "register_cache", "invalidate", "clear_all", "set_coherent", "is_coherent"]
@@ -0,0 +1,245 @@
+"""
+Compresión de respuestas (ASGI puro): gzip, y brotli / zstd si están instalados.
+
+- Solo comprime respuestas de al menos `compression_minimum_size` bytes; las
+  chicas salen tal cual (no vale la pena gastar CPU en ellas).
+- No toca respuestas que ya traen Content-Encoding, tipos ya comprimidos
+  (imágenes, video, zip, ...) ni `text/event-stream`.
+- Las respuestas en streaming (ej: GET /users/export) se comprimen por
+  trozos con flush en cada uno, sin acumular el cuerpo completo.
+- El nivel se puede fijar por ruta con el decorador `compress`:
+
+      @router.get("/export")
+      @compress(level=1)        # o compress(enabled=False)
+      async def export_users_endpoint(...): ...
+
+  El nivel usa la escala de gzip (1-9) y se aplica igual a brotli y zstd.
+- Las rutas de `cached_paths` (el documento OpenAPI) se generan y comprimen
+  una sola vez por codificación y después se sirven desde memoria.
+"""
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # Opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Opcional
+    zstandard = None
+
+SKIP_CONTENT_TYPES = (
+    "image/", "video/", "audio/", "font/woff",
+    "application/zip", "application/gzip", "application/x-gzip",
+    "application/x-7z-compressed", "application/x-rar-compressed",
+    "application/octet-stream", "application/pdf",
+    "text/event-stream",
+)
+COMPRESSIBLE_EXCEPTIONS = ("image/svg+xml",)
+
+
+def compress(level: Optional[int] = None, enabled: bool = True) -> Callable:
+    """Marca un endpoint con su nivel de compresión (o lo excluye)."""
+
+    def decorator(func):
+        func.__compression__ = {"level": level, "enabled": enabled}
+        return func
+
+    return decorator
+
+
+# ======================
+# Codificadores
+# ======================
+class _Encoder:
+    """Compresor incremental: compress() por trozo (con flush), finish() al final."""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=min(level, 11))
+        elif encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._obj.process(data) + self._obj.flush()
+        if self.encoding == "zstd":
+            return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._obj.process(data) + self._obj.finish()
+        if self.encoding == "zstd":
+            return self._obj.compress(data) + self._obj.flush()
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_FINISH)
+
+
+def available_encodings() -> List[str]:
+    """Codificaciones soportadas, en orden de preferencia del servidor."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def choose_encoding(accept_encoding: str, supported: Iterable[str]) -> Optional[str]:
+    """Elige la codificación según Accept-Encoding (respeta q=0 y el comodín *)."""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+
+    best: Optional[Tuple[float, str]] = None
+    for encoding in supported:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0 and (best is None or quality > best[0]):
+            best = (quality, encoding)
+    return best[1] if best else None
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    if content_type.startswith(COMPRESSIBLE_EXCEPTIONS):
+        return True
+    return not content_type.startswith(SKIP_CONTENT_TYPES)
+
+
+# ======================
+# Middleware
+# ======================
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        level: int = 5,
+        cached_paths: Iterable[str] = (),
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.encodings = available_encodings()
+        self.cached_paths = set(cached_paths)
+        self._cache: Dict[Tuple[str, str], Tuple[dict, bytes]] = {}  # (path, encoding) -> (start, body)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = choose_encoding(headers.get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        cache_key = (scope["path"], encoding)
+        if scope["method"] == "GET" and scope["path"] in self.cached_paths:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                start, body = cached
+                # Copia: los middlewares externos agregan headers al mensaje (ej: X-Request-ID)
+                await send({**start, "headers": list(start["headers"])})
+                await send({"type": "http.response.body", "body": body})
+                return
+        else:
+            cache_key = None
+
+        responder = _CompressionResponder(self, scope, send, encoding, cache_key)
+        await self.app(scope, receive, responder.send)
+
+    def _route_options(self, scope: Scope) -> dict:
+        endpoint = getattr(scope.get("route"), "endpoint", None)
+        return getattr(endpoint, "__compression__", {})
+
+
+class _CompressionResponder:
+    """Intercepta los mensajes de respuesta de un request y decide si comprimir."""
+
+    def __init__(self, middleware: CompressionMiddleware, scope: Scope, send: Send, encoding: str, cache_key):
+        self.middleware = middleware
+        self.scope = scope
+        self._send = send
+        self.encoding = encoding
+        self.cache_key = cache_key
+        self.start: Optional[Message] = None
+        self.encoder: Optional[_Encoder] = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message  # Se retiene hasta ver el primer trozo del cuerpo
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            if not self._should_compress(body, more_body):
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send(message)
+                return
+            options = self.middleware._route_options(self.scope)
+            self.encoder = _Encoder(self.encoding, options.get("level") or self.middleware.level)
+            headers = MutableHeaders(scope=self.start)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+
+            if not more_body:
+                compressed = self.encoder.finish(body)
+                headers["Content-Length"] = str(len(compressed))
+                if self.cache_key is not None and self.start["status"] == 200:
+                    start = {**self.start, "headers": list(self.start["headers"])}
+                    self.middleware._cache[self.cache_key] = (start, compressed)
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": compressed})
+                return
+
+            # Streaming: el largo final no se conoce
+            del headers["Content-Length"]
+            await self._send(self.start)
+
+        if more_body:
+            chunk = self.encoder.compress(body)
+            if chunk:
+                await self._send({"type": "http.response.body", "body": chunk, "more_body": True})
+        else:
+            await self._send({"type": "http.response.body", "body": self.encoder.finish(body)})
+
+    def _should_compress(self, body: bytes, more_body: bool) -> bool:
+        if self.start["status"] < 200 or self.start["status"] in (204, 304):
+            return False
+        headers = Headers(raw=self.start["headers"])
+        if not _compressible(headers):
+            return False
+        if not self.middleware._route_options(self.scope).get("enabled", True):
+            return False
+        if more_body:
+            return True  # Streaming: el tamaño total es desconocido, se asume grande
+        return len(body) >= self.middleware.minimum_size
@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -7,7 +8,7 @@ class Settings(BaseSettings):
     app_name: str = Field("Almacen", env="APP_NAME")
     app_env: str = Field("development", env="APP_ENV")
     app_version: str = Field("0.1.0", env="APP_VERSION")
-    debug: bool = Field(True, env="DEBUG")           # <- agregar esto
+    debug: bool = Field(False, env="DEBUG")          # True solo en desarrollo: uvicorn con reload
 
     # --- Database ---
     db_user: str = Field(..., env="DB_USER")
@@ -15,6 +16,7 @@ class Settings(BaseSettings):
     db_host: str = Field(..., env="DB_HOST")
     db_port: int = Field(..., env="DB_PORT")
     db_name: str = Field(..., env="DB_NAME")
+    database_url: str = Field("", env="DATABASE_URL")  # Si se define, reemplaza la URL async armada con DB_* (ej: pruebas de carga)
 
     # --- Auth / Security ---
     jwt_secret: str = Field(..., env="JWT_SECRET")
@@ -22,27 +24,114 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = Field(15, env="ACCESS_TOKEN_EXPIRE_MINUTES")
     refresh_token_expire_days: int = Field(7, env="REFRESH_TOKEN_EXPIRE_DAYS")
 
+    # --- Argon2 (calibrar con `python -m tools.calibrate_argon2`) ---
+    # Al cambiarlos, los hashes viejos siguen validando y se rehashean en el próximo login
+    argon2_time_cost: int = Field(2, env="ARGON2_TIME_COST")
+    argon2_memory_cost: int = Field(102400, env="ARGON2_MEMORY_COST")  # KiB por hash
+    argon2_parallelism: int = Field(8, env="ARGON2_PARALLELISM")
+
     # --- Rate limiting ---
     rate_limit_requests: int = Field(100, env="RATE_LIMIT_REQUESTS")
     rate_limit_minutes: int = Field(1, env="RATE_LIMIT_MINUTES")
+    rate_limit_enabled: bool = Field(True, env="RATE_LIMIT_ENABLED")
 
     # --- Logging ---
     log_level: str = Field("INFO", env="LOG_LEVEL")
+    log_json: Optional[bool] = Field(None, env="LOG_JSON")  # None = JSON fuera de desarrollo
+    log_rate_limit: float = Field(50.0, env="LOG_RATE_LIMIT")  # Registros/s por logger bajo ERROR (0 = sin límite)
+    log_rate_burst: int = Field(200, env="LOG_RATE_BURST")
+    log_sample_rates: str = Field("jwt_decode_failed=0.01", env="LOG_SAMPLE_RATES")  # evento=fracción,...
+    sql_echo: bool = Field(False, env="SQL_ECHO")  # Loguea cada sentencia SQL (solo para depurar)
+
+    # --- Métricas ---
+    metrics_enabled: bool = Field(True, env="METRICS_ENABLED")
+    metrics_dir: str = Field("", env="METRICS_DIR")  # Directorio compartido entre workers ("" = un solo proceso)
+    metrics_flush_interval: float = Field(5.0, env="METRICS_FLUSH_INTERVAL")
+
+    # --- Profiler SQL ---
+    sql_profile_enabled: bool = Field(False, env="SQL_PROFILE_ENABLED")
+    sql_profile_sample_rate: float = Field(0.1, env="SQL_PROFILE_SAMPLE_RATE")  # Fracción de requests perfilados
+    sql_slow_query_ms: float = Field(200.0, env="SQL_SLOW_QUERY_MS")
+    sql_slow_query_explain: bool = Field(False, env="SQL_SLOW_QUERY_EXPLAIN")
+    sql_n_plus_one_threshold: int = Field(5, env="SQL_N_PLUS_ONE_THRESHOLD")
+
+    # --- Event loop / profiler ---
+    loop_monitor_enabled: bool = Field(True, env="LOOP_MONITOR_ENABLED")
+    loop_monitor_interval_ms: float = Field(250.0, env="LOOP_MONITOR_INTERVAL_MS")
+    loop_lag_threshold_ms: float = Field(200.0, env="LOOP_LAG_THRESHOLD_MS")
+    profiler_max_seconds: float = Field(60.0, env="PROFILER_MAX_SECONDS")
+
+    # --- Tracing ---
+    tracing_enabled: bool = Field(False, env="TRACING_ENABLED")
+    tracing_sample_rate: float = Field(0.01, env="TRACING_SAMPLE_RATE")  # Solo para requests sin traceparent
+    tracing_export_path: str = Field("logs/traces.jsonl", env="TRACING_EXPORT_PATH")
+    tracing_max_bytes: int = Field(50 * 1024 * 1024, env="TRACING_MAX_BYTES")
+    tracing_backup_count: int = Field(5, env="TRACING_BACKUP_COUNT")
+    tracing_otlp_endpoint: str = Field("", env="TRACING_OTLP_ENDPOINT")  # ej: http://localhost:4318
 
     # --- Miscellaneous ---
     api_prefix: str = Field("/api/v1", env="API_PREFIX")
     server_host: str = Field("0.0.0.0", env="SERVER_HOST")
     server_port: int = Field(8000, env="SERVER_PORT")
+    workers: int = Field(0, env="WORKERS")  # 0 = CPUs disponibles (afinidad / cuota del cgroup)
+    server_backlog: int = Field(2048, env="SERVER_BACKLOG")
+    server_keep_alive: int = Field(5, env="SERVER_KEEP_ALIVE")  # Segundos
+    server_access_log: bool = Field(True, env="SERVER_ACCESS_LOG")
+    worker_max_requests: int = Field(0, env="WORKER_MAX_REQUESTS")  # 0 = sin reciclado por requests
+    worker_max_requests_jitter: int = Field(0, env="WORKER_MAX_REQUESTS_JITTER")
+    worker_max_memory_mb: int = Field(0, env="WORKER_MAX_MEMORY_MB")  # 0 = sin límite de RSS
     
     # Pool de conexiones
     pool_size: int = 20
     max_overflow: int = 10
     pool_timeout: int = 30
     pool_recycle: int = 1800
-    
+
+    # --- Warm-up / readiness ---
+    warmup_enabled: bool = Field(True, env="WARMUP_ENABLED")
+    warmup_connections: int = Field(5, env="WARMUP_CONNECTIONS")  # Conexiones del pool abiertas al arrancar (máx. pool_size)
+    warmup_timeout: float = Field(30.0, env="WARMUP_TIMEOUT")
+    drain_timeout: float = Field(30.0, env="DRAIN_TIMEOUT")  # Espera máxima por requests en curso al apagar
+
+    # --- Compresión de respuestas ---
+    compression_enabled: bool = Field(True, env="COMPRESSION_ENABLED")
+    compression_minimum_size: int = Field(1024, env="COMPRESSION_MINIMUM_SIZE")  # Bytes; por debajo sale sin comprimir
+    compression_level: int = Field(5, env="COMPRESSION_LEVEL")  # Escala de gzip (1-9); se puede fijar por ruta
+
+    # --- Invalidación de cachés entre workers (LISTEN/NOTIFY) ---
+    cache_invalidation_enabled: bool = Field(True, env="CACHE_INVALIDATION_ENABLED")
+    cache_listener_heartbeat: float = Field(15.0, env="CACHE_LISTENER_HEARTBEAT")  # Segundos entre SELECT 1 de control
+
+    # --- Idempotencia (header Idempotency-Key) ---
+    idempotency_enabled: bool = Field(True, env="IDEMPOTENCY_ENABLED")
+    idempotency_ttl: int = Field(86400, env="IDEMPOTENCY_TTL")  # Segundos que se guarda la respuesta
+    idempotency_login_ttl: int = Field(60, env="IDEMPOTENCY_LOGIN_TTL")  # Login: la respuesta trae tokens revocables
+    idempotency_lock_timeout: int = Field(60, env="IDEMPOTENCY_LOCK_TIMEOUT")  # Vencimiento de una clave en curso
+    idempotency_wait_timeout: float = Field(10.0, env="IDEMPOTENCY_WAIT_TIMEOUT")  # Espera de un duplicado antes del 409
+    idempotency_purge_interval: int = Field(3600, env="IDEMPOTENCY_PURGE_INTERVAL")
+
+    # --- Importación masiva ---
+    bulk_import_chunk_size: int = Field(1000, env="BULK_IMPORT_CHUNK_SIZE")
+    bulk_import_max_rows: int = Field(10000, env="BULK_IMPORT_MAX_ROWS")  # Filas por request en /users/import
+    password_hash_workers: int = Field(0, env="PASSWORD_HASH_WORKERS")  # 0 = todos los cores
+
+    # --- Operaciones masivas ---
+    bulk_max_ids: int = Field(1000, env="BULK_MAX_IDS")
+
+    # --- Exportación ---
+    export_batch_size: int = Field(1000, env="EXPORT_BATCH_SIZE")
+
+    # --- Paginación ---
+    pagination_default_size: int = Field(50, env="PAGINATION_DEFAULT_SIZE")
+    pagination_max_size: int = Field(100, env="PAGINATION_MAX_SIZE")
+    pagination_count_strategy: str = Field("exact", env="PAGINATION_COUNT_STRATEGY")  # exact | estimated | cached | none (aproximados: opt-in)
+    pagination_count_cache_ttl: float = Field(30.0, env="PAGINATION_COUNT_CACHE_TTL")
+    pagination_exact_count_below: int = Field(10000, env="PAGINATION_EXACT_COUNT_BELOW")  # Con "estimated", por debajo de esto se cuenta exacto
 
     @property
     def database_url_async(self) -> str:
+        if self.database_url:
+            return self.database_url
         return f"postgresql+asyncpg://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
 
     @property
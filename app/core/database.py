@@ -1,24 +1,83 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import get_settings
-from typing import AsyncGenerator
+from app.core import metrics
+from typing import AsyncGenerator, Callable, List, Optional
+import time
 
 settings = get_settings()
 
-# Motor asíncrono PostgreSQL con opciones de pool
-async_engine = create_async_engine(
-    settings.database_url_async,
-    echo=settings.app_env == "development",
-    future=True,
-    pool_size=settings.pool_size,
-    max_overflow=settings.max_overflow,
-    pool_timeout=settings.pool_timeout,
-    pool_recycle=settings.pool_recycle,
-)
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Pool que mide cuánto espera cada checkout hasta obtener una conexión."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+# ======================
+# Motor (se crea en el primer uso)
+# ======================
+# Importar este módulo no abre nada ni carga el driver: el motor se crea en
+# la primera sesión (o en get_engine()), ya dentro del worker.
+_engine: Optional[AsyncEngine] = None
+_engine_hooks: List[Callable[[AsyncEngine], None]] = []
+
+
+def on_engine_created(hook: Callable[[AsyncEngine], None]) -> None:
+    """Registra una función que recibe el motor al crearse (ej: listeners de profiling / tracing)."""
+    _engine_hooks.append(hook)
+    if _engine is not None:
+        hook(_engine)
+
+
+def get_engine() -> AsyncEngine:
+    """Motor asíncrono PostgreSQL con opciones de pool (lo crea la primera vez)."""
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(
+            settings.database_url_async,
+            echo=False,  # Las sentencias se loguean con SQL_ECHO a través de app.core.logger
+            future=True,
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+            pool_recycle=settings.pool_recycle,
+            poolclass=InstrumentedQueuePool,
+        )
+        for hook in _engine_hooks:
+            hook(_engine)
+    return _engine
+
+
+def _collect_pool_metrics() -> None:
+    if _engine is None:
+        return
+    pool = _engine.sync_engine.pool
+    metrics.DB_POOL_CONNECTIONS.set(pool.checkedout(), state="in_use")
+    metrics.DB_POOL_CONNECTIONS.set(pool.checkedin(), state="idle")
+    metrics.DB_POOL_CONNECTIONS.set(max(pool.overflow(), 0), state="overflow")
+
+
+metrics.register_collector(_collect_pool_metrics)
+
+
+class _LazySessionmaker(sessionmaker):
+    """sessionmaker que se enlaza al motor recién al crear la primera sesión."""
+
+    def __call__(self, **local_kw) -> AsyncSession:
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
 
 # Factory de sesiones asincrónicas
-AsyncSessionLocal = sessionmaker(
-    bind=async_engine,
+AsyncSessionLocal = _LazySessionmaker(
     class_=AsyncSession,
     expire_on_commit=False
 )
@@ -35,5 +94,13 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
         finally:
             await session.close()
 
+
+def dispose_inherited_engine() -> None:
+    """Tras un fork: descarta (sin cerrarlas) las conexiones heredadas del proceso padre."""
+    if _engine is not None:
+        _engine.sync_engine.dispose(close=False)
+
+
 async def close_async_engine():
-    await async_engine.dispose()
+    if _engine is not None:
+        await _engine.dispose()
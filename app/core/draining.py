@@ -0,0 +1,153 @@
+"""
+Drenado ordenado del worker al apagarse.
+
+- InFlightMiddleware cuenta los requests en curso (incluye las background
+  tasks de Starlette, que corren antes de que el request termine). En modo
+  drenado responde 503 + `Connection: close` a todo request nuevo salvo
+  /health, para que el cliente reintente en otro worker.
+- Al recibir SIGTERM, `install_signal_handler` activa el drenado (readiness
+  pasa a 503) y recién cuando no quedan requests en curso, o vence
+  `drain_timeout`, le pasa la señal a uvicorn para que cierre el socket.
+- `drain()` se llama también desde el shutdown del lifespan, antes de
+  cerrar el engine, por si el apagado no vino por SIGTERM.
+"""
+import asyncio
+import json
+import logging
+import signal
+import threading
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core import metrics
+from app.core.config import get_settings
+from app.core.health import state
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_in_flight = 0
+_idle = asyncio.Event()
+_idle.set()
+_drain_task: Optional[asyncio.Task] = None
+
+_DRAINING_BODY = json.dumps({"detail": "Servidor apagándose"}).encode()
+
+
+def in_flight() -> int:
+    return _in_flight
+
+
+def _collect_in_flight() -> None:
+    metrics.HTTP_IN_FLIGHT.set(_in_flight)
+
+
+metrics.register_collector(_collect_in_flight)
+
+
+# ======================
+# Middleware
+# ======================
+class InFlightMiddleware:
+    """Cuenta los requests en curso y rechaza los nuevos mientras se drena."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.health_prefix = f"{settings.api_prefix}/health"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        global _in_flight
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if state.draining and not scope["path"].startswith(self.health_prefix):
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"connection", b"close"),
+                    (b"retry-after", b"1"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": _DRAINING_BODY})
+            return
+
+        _in_flight += 1
+        _idle.clear()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _in_flight -= 1
+            if _in_flight == 0:
+                _idle.set()
+
+
+# ======================
+# Drenado
+# ======================
+async def _wait_idle(timeout: float) -> None:
+    try:
+        await asyncio.wait_for(_idle.wait(), timeout=max(timeout, 0))
+    except asyncio.TimeoutError:
+        pass
+
+
+async def _drain() -> None:
+    state.draining = True
+    start = time.monotonic()
+    logger.info(f"Drenando: {_in_flight} request(s) en curso, plazo {settings.drain_timeout:.0f}s")
+
+    await _wait_idle(settings.drain_timeout)
+
+    elapsed = time.monotonic() - start
+    metrics.DRAIN_SECONDS.observe(elapsed)
+    if _in_flight:
+        metrics.DRAIN_ABANDONED_REQUESTS.inc(_in_flight)
+        logger.warning(f"Drenado vencido tras {elapsed:.1f}s: se abandonan {_in_flight} request(s)")
+    else:
+        logger.info(f"Drenado completo en {elapsed:.1f}s")
+
+
+async def drain() -> None:
+    """Activa el drenado (si no estaba activo) y espera a que termine."""
+    global _drain_task
+    if _drain_task is None:
+        _drain_task = asyncio.create_task(_drain(), name="drain")
+    await _drain_task
+
+
+def install_signal_handler() -> None:
+    """
+    Intercepta SIGTERM (llamar desde el startup del lifespan, cuando uvicorn
+    ya instaló sus handlers): drena primero y después delega en el handler
+    original. Un segundo SIGTERM se delega de inmediato.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return  # Solo el hilo principal puede instalar handlers (ej: TestClient)
+    loop = asyncio.get_running_loop()
+    original = signal.getsignal(signal.SIGTERM)
+    if not callable(original):
+        return
+
+    def forward(signum, frame) -> None:
+        signal.signal(signal.SIGTERM, original)
+        original(signum, frame)
+
+    async def drain_then_forward(signum) -> None:
+        try:
+            await drain()
+        finally:
+            forward(signum, None)
+
+    def handler(signum, frame) -> None:
+        if state.draining:
+            forward(signum, frame)
+            return
+        state.draining = True  # Readiness pasa a 503 ya, antes de volver al loop
+        loop.call_soon_threadsafe(lambda: loop.create_task(drain_then_forward(signum)))
+
+    signal.signal(signal.SIGTERM, handler)
@@ -0,0 +1,136 @@
+"""
+Warm-up de arranque y endpoints de liveness / readiness.
+
+Al iniciar, el worker todavía no abrió conexiones del pool, asyncpg no
+hizo la introspección de tipos, SQLAlchemy no compiló las sentencias y
+Argon2 no reservó su memoria: los primeros requests pagarían todo eso.
+`run_warmup` (tarea de fondo del lifespan) lo hace antes:
+
+- abre `warmup_connections` conexiones en paralelo y, en cada una, corre
+  los warm-ups de sentencias registrados (compilación + prepared
+  statements de asyncpg, que son por conexión);
+- corre una vez los warm-ups generales (ej: un hash/verify de Argon2).
+
+Los módulos registran sus warm-ups con `register_statements` /
+`register_task`. `/health/live` responde siempre que el proceso atienda;
+`/health/ready` responde 503 hasta que el warm-up termine y, de nuevo,
+cuando el worker empieza a drenar para apagarse (ver app.core.draining).
+"""
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+StatementWarmup = Callable[[AsyncSession], Awaitable[None]]
+TaskWarmup = Callable[[], Awaitable[None]]
+
+_statement_warmups: List[StatementWarmup] = []
+_task_warmups: List[TaskWarmup] = []
+
+
+def register_statements(fn: StatementWarmup) -> StatementWarmup:
+    """Registra un warm-up que se ejecuta en cada conexión pre-abierta."""
+    _statement_warmups.append(fn)
+    return fn
+
+
+def register_task(fn: TaskWarmup) -> TaskWarmup:
+    """Registra un warm-up que se ejecuta una sola vez por worker."""
+    _task_warmups.append(fn)
+    return fn
+
+
+# ======================
+# Estado del worker
+# ======================
+class _State:
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+        self.warmup_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+
+state = _State()
+
+
+async def _warm_statements(db: AsyncSession) -> None:
+    for fn in _statement_warmups:
+        await fn(db)
+    await db.rollback()
+
+
+async def _warm_up() -> None:
+    connections = max(1, min(settings.warmup_connections, settings.pool_size))
+    async with contextlib.AsyncExitStack() as stack:
+        sessions = [await stack.enter_async_context(AsyncSessionLocal()) for _ in range(connections)]
+        # Cada sesión retiene su conexión hasta el final: el pool abre `connections` distintas
+        await asyncio.gather(*(db.connection() for db in sessions))
+        await asyncio.gather(*(_warm_statements(db) for db in sessions))
+    for fn in _task_warmups:
+        await fn()
+
+
+async def run_warmup() -> None:
+    """
+    Ejecuta el warm-up y marca el worker como listo. Si falla (ej: la BD
+    todavía no acepta conexiones) reintenta con backoff; mientras tanto
+    /health/ready sigue respondiendo 503.
+    """
+    if not settings.warmup_enabled:
+        state.ready = True
+        return
+
+    delay = 0.5
+    while True:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(_warm_up(), timeout=settings.warmup_timeout)
+        except Exception as e:
+            state.last_error = f"{type(e).__name__}: {e}"
+            logger.warning(f"Warm-up falló, reintentando en {delay:.1f}s: {state.last_error}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+            continue
+
+        state.warmup_seconds = time.perf_counter() - start
+        state.last_error = None
+        state.ready = True
+        logger.info(f"Warm-up completo en {state.warmup_seconds * 1000:.0f} ms")
+        return
+
+
+# ======================
+# Endpoints
+# ======================
+router = APIRouter()
+
+
+@router.get("/health/live")
+async def liveness():
+    """El proceso está vivo y el event loop atiende requests."""
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def readiness():
+    """Listo para recibir tráfico solo después del warm-up y mientras no se esté drenando."""
+    if state.draining:
+        return JSONResponse(status_code=503, content={"status": "draining"})
+    if not state.ready:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "warming_up", "error": state.last_error},
+        )
+    return {"status": "ready", "warmup_seconds": state.warmup_seconds}
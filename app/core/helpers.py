@@ -1,15 +1,17 @@
+import json
 from slugify import slugify as real_slugify
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List, Generic, TypeVar
-from pydantic.generics import GenericModel
+from sqlalchemy import or_, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from typing import Any, Hashable, List, Generic, Optional, Type, TypeVar, Sequence
+from pydantic import BaseModel
 
-from fastapi import Request, HTTPException, Depends
-from jose import JWTError
-from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
 from app.core.config import get_settings
-from app.modules.user import auth, crud
-from app.core.database import get_async_session
+
+settings = get_settings()
 
 
 def slugify(text: str) -> str:
@@ -44,12 +46,64 @@ async def generate_unique_slug(db: AsyncSession, model, base_text: str, digits:
     return slug
 
 
+async def generate_unique_slugs(
+    db: AsyncSession,
+    model,
+    base_texts: Sequence[str],
+    digits: int = 3,
+    batch_size: int = 500,
+) -> List[str]:
+    """
+    Versión por lotes de generate_unique_slug para importaciones masivas.
+
+    En lugar de un SELECT por intento, consulta de una vez todos los slugs
+    existentes que comparten base (`base` o `base-NNN`) y asigna los sufijos
+    en memoria, evitando también colisiones dentro del mismo lote.
+
+    Args:
+        db (AsyncSession): sesión de la base de datos.
+        model: modelo SQLAlchemy con atributo 'slug'.
+        base_texts (Sequence[str]): textos base, uno por slug a generar.
+        digits (int): cantidad de dígitos del sufijo incremental (default=3).
+        batch_size (int): cantidad de bases distintas por consulta.
+
+    Returns:
+        List[str]: slugs únicos en el mismo orden que base_texts.
+    """
+    bases = [slugify(text) for text in base_texts]
+    unique_bases = list(dict.fromkeys(bases))
+
+    taken = set()
+    for start in range(0, len(unique_bases), batch_size):
+        chunk = unique_bases[start:start + batch_size]
+        conditions = [
+            or_(model.slug == base, model.slug.like(f"{base}-%"))
+            for base in chunk
+        ]
+        result = await db.execute(select(model.slug).where(or_(*conditions)))
+        taken.update(result.scalars().all())
+
+    slugs = []
+    next_index = {}
+    for base in bases:
+        slug = base
+        index = next_index.get(base, 1)
+        while slug in taken:
+            slug = f"{base}-{index:0{digits}d}"
+            index += 1
+        next_index[base] = index
+        taken.add(slug)
+        slugs.append(slug)
+
+    return slugs
+
+
 # 🔹 TypeVar nos permite crear "tipos genéricos"
 # Ejemplo: ListResponse[UserOut], ListResponse[RoleOut], etc.
 T = TypeVar("T")
 
 
-class GenericList(GenericModel, Generic[T]):
+class GenericList(BaseModel, Generic[T]):
     """
     Respuesta estándar para listas pequeñas SIN paginación.
     Úsala cuando esperas pocos datos (ej: lista de roles, sucursales, etc.)
@@ -58,44 +112,131 @@ class GenericList(GenericModel, Generic[T]):
     items: List[T]  # Lista de objetos de tipo T (ej: UserOut, RoleOut)
 
 
-class GenericPaginatedList(GenericModel, Generic[T]):
+class GenericPaginatedList(BaseModel, Generic[T]):
     """
     Respuesta estándar para listas GRANDES CON paginación.
     Úsala en vistas donde el dataset puede crecer (ej: usuarios, productos, etc.)
     """
-    total: int  # Número total de elementos disponibles en la BD
+    total: Optional[int] = None  # Total de elementos (None si no se contó, ver total_strategy)
+    total_strategy: str = "exact"  # Cómo se obtuvo total: exact | estimated | cached | none
     page: int   # Página actual
     size: int   # Cantidad de elementos por página
+    has_next: bool = False  # Hay al menos un elemento más allá de esta página
     items: List[T]  # Lista de objetos de la página actual (tipo T)
-    
-    
-settings = get_settings()
 
-async def get_current_user(
-    request: Request,
-    db: AsyncSession = Depends(get_async_session)
-):
+
+# ======================
+# Paginación y conteo
+# ======================
+COUNT_STRATEGIES = ("exact", "estimated", "cached", "none")
+
+
+class _Explain(Executable, ClauseElement):
+    """`EXPLAIN (FORMAT JSON) <select>` conservando los parámetros ligados del select."""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def count_exact(db: AsyncSession, query) -> int:
+    """SELECT COUNT(*) sobre la query filtrada (sin ORDER BY)."""
+    count_query = select(func.count()).select_from(query.order_by(None).subquery())
+    return (await db.execute(count_query)).scalar_one()
+
+
+async def count_estimated(db: AsyncSession, query) -> Optional[int]:
     """
-    Obtiene el usuario autenticado desde el header Authorization: Bearer <token>.
-    - Decodifica el JWT.
-    - Obtiene el usuario de la DB.
-    - Levanta 401 si el token es inválido o el usuario no existe.
+    Estimación del planner (filas del nodo raíz de EXPLAIN) para la query
+    filtrada. No lee la tabla: cuesta lo mismo con mil o diez millones de
+    filas. Devuelve None si el motor no es PostgreSQL.
     """
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Token no proporcionado")
-
-    token = auth_header.split(" ")[1]
-    payload = auth.decode_token(token)
-    if not payload or payload.get("type") != "access":
-        raise HTTPException(status_code=401, detail="Token inválido")
+    if db.bind.dialect.name != "postgresql":
+        return None
+    raw = (await db.execute(_Explain(query.order_by(None)))).scalar_one()
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    return int(plan["Plan Rows"])
+
+
+async def count_total(
+    db: AsyncSession,
+    query,
+    strategy: str,
+    count_cache: Optional[TTLCache] = None,
+    cache_key: Optional[Hashable] = None,
+) -> tuple:
+    """
+    Cuenta los resultados de query según la estrategia pedida.
 
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Token inválido")
+    - exact: COUNT(*) en cada llamada.
+    - estimated: estimación del planner; si es menor que
+      `pagination_exact_count_below` se cuenta exacto (es barato).
+    - cached: COUNT(*) exacto guardado en count_cache por cache_key
+      durante el TTL de la caché.
+    - none: no cuenta.
 
-    user = await crud.get_user_by_id(db, int(user_id))
-    if not user or not user.is_active:
-        raise HTTPException(status_code=401, detail="Usuario no válido")
+    Returns:
+        tuple: (total o None, estrategia que produjo el número).
+    """
+    if strategy == "none":
+        return None, "none"
+
+    if strategy == "cached" and count_cache is not None:
+        total = count_cache.get(cache_key)
+        if total is not None:
+            return total, "cached"
+        total = await count_exact(db, query)
+        count_cache.set(cache_key, total)
+        return total, "exact"
+
+    if strategy == "estimated":
+        estimate = await count_estimated(db, query)
+        if estimate is not None and estimate >= settings.pagination_exact_count_below:
+            return estimate, "estimated"
+
+    return await count_exact(db, query), "exact"
+
+
+async def paginate_query(
+    db: AsyncSession,
+    query,
+    page: int,
+    size: int,
+    schema: Type[Any],
+    count_strategy: Optional[str] = None,
+    count_cache: Optional[TTLCache] = None,
+    cache_key: Optional[Hashable] = None,
+) -> GenericPaginatedList:
+    """
+    Pagina una query ORM con LIMIT/OFFSET y arma un GenericPaginatedList[schema].
 
-    return user
+    Trae size + 1 filas para saber si hay página siguiente sin depender del
+    total, de modo que `count_strategy="none"` sigue permitiendo navegar.
+    Si la página no está vacía y es la última, el total sale exacto sin
+    consultar: offset + filas traídas.
+    """
+    strategy = count_strategy or settings.pagination_count_strategy
+    offset = (page - 1) * size
+    result = await db.execute(query.limit(size + 1).offset(offset))
+    rows = result.scalars().all()
+    has_next = len(rows) > size
+
+    if strategy != "none" and not has_next and (rows or page == 1):
+        total, total_strategy = offset + len(rows), "exact"
+    else:
+        total, total_strategy = await count_total(db, query, strategy, count_cache, cache_key)
+
+    return GenericPaginatedList[schema](
+        total=total,
+        total_strategy=total_strategy,
+        page=page,
+        size=size,
+        has_next=has_next,
+        items=[schema.model_validate(row) for row in rows[:size]],
+    )
@@ -0,0 +1,347 @@
+"""
+Claves de idempotencia (header `Idempotency-Key`) para endpoints POST.
+
+Un reintento del cliente con la misma clave no vuelve a ejecutar el endpoint
+(hash Argon2, inserts, ...): recibe la respuesta guardada de la primera
+ejecución, con el header `Idempotent-Replayed: true`.
+
+- Se activa por endpoint con el decorador `idempotent`:
+
+      @router.post("/login")
+      @limiter.limit("10/minute")
+      @idempotent
+      async def login_user(...): ...
+
+- La clave se reclama insertando una fila en `idempotency_keys` (PK = ruta +
+  clave): entre workers solo uno gana el INSERT y ejecuta; los duplicados
+  esperan (hasta `idempotency_wait_timeout`) a que la respuesta esté
+  guardada. Dentro del mismo worker los duplicados además se serializan con
+  un lock local, así no consultan la tabla en bucle.
+- La clave queda atada al request (hash de query string, Authorization y
+  cuerpo): reusarla con otro request devuelve 422.
+- Se guardan las respuestas definitivas (2xx y 4xx salvo 408/409/425/429);
+  ante un 5xx o una excepción la clave se libera para poder reintentar.
+- Una clave en curso cuyo worker murió vence a los `idempotency_lock_timeout`
+  segundos; las respuestas guardadas, a los `idempotency_ttl` (o el `ttl`
+  del decorador: login usa uno corto, porque su respuesta trae tokens que
+  se pueden revocar).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, JSON, LargeBinary, String, delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import metrics
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal, Base
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+RETRYABLE_STATUSES = {408, 409, 425, 429}  # No son definitivas: no se guardan
+POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 0.5
+
+
+class IdempotencyKey(Base):
+    """Clave reclamada y, cuando el request terminó, su respuesta."""
+    __tablename__ = "idempotency_keys"
+
+    route = Column(String(255), primary_key=True)
+    key = Column(String(MAX_KEY_LENGTH), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL = en curso
+    headers = Column(JSON, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+def idempotent(func: Optional[Callable] = None, *, ttl: Optional[int] = None) -> Callable:
+    """
+    Marca un endpoint POST para aceptar `Idempotency-Key`.
+    Se usa como `@idempotent` o `@idempotent(ttl=...)`; `ttl` (segundos)
+    reemplaza a `idempotency_ttl` para las respuestas de ese endpoint.
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__idempotent__ = True
+        endpoint.__idempotency_ttl__ = ttl
+        return endpoint
+
+    return decorator(func) if func is not None else decorator
+
+
+# ======================
+# Persistencia
+# ======================
+async def _claim(route: str, key: str, fingerprint: str) -> Tuple[bool, Optional[IdempotencyKey]]:
+    """
+    Intenta reclamar la clave. Devuelve (True, None) si este request la
+    obtuvo, o (False, fila existente) si otro la tiene.
+    """
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        # Una clave vencida (respuesta vieja o worker caído) se puede reclamar de nuevo
+        await db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.route == route,
+                IdempotencyKey.key == key,
+                IdempotencyKey.expires_at < now,
+            )
+        )
+        db.add(IdempotencyKey(
+            route=route,
+            key=key,
+            fingerprint=fingerprint,
+            expires_at=now + timedelta(seconds=settings.idempotency_lock_timeout),
+        ))
+        try:
+            await db.commit()
+            return True, None
+        except IntegrityError:
+            await db.rollback()
+        return False, await _load(db, route, key)
+
+
+async def _load(db, route: str, key: str) -> Optional[IdempotencyKey]:
+    result = await db.execute(
+        select(IdempotencyKey).where(IdempotencyKey.route == route, IdempotencyKey.key == key)
+    )
+    return result.scalars().first()
+
+
+async def _store(route: str, key: str, status: int, headers: List[List[str]], body: bytes, ttl: int) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.route == route, IdempotencyKey.key == key)
+            .values(
+                status_code=status,
+                headers=headers,
+                body=body,
+                expires_at=datetime.utcnow() + timedelta(seconds=ttl),
+            )
+        )
+        await db.commit()
+
+
+async def _release(route: str, key: str) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.route == route, IdempotencyKey.key == key)
+        )
+        await db.commit()
+
+
+async def purge_expired() -> int:
+    """Borra las claves vencidas. Retorna cuántas se borraron."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow())
+        )
+        await db.commit()
+    return result.rowcount
+
+
+async def purge_periodically() -> None:
+    """Tarea de fondo del lifespan: limpieza de claves vencidas."""
+    while True:
+        await asyncio.sleep(settings.idempotency_purge_interval)
+        try:
+            purged = await purge_expired()
+            if purged:
+                logger.info(f"Claves de idempotencia vencidas borradas: {purged}")
+        except Exception as e:
+            logger.warning(f"No se pudieron borrar las claves de idempotencia vencidas: {e}")
+
+
+# ======================
+# Middleware
+# ======================
+class IdempotencyMiddleware:
+    """Ejecuta una sola vez cada (ruta, Idempotency-Key) y repite su respuesta."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._paths: Optional[Dict[str, int]] = None
+        self._locks: Dict[tuple, list] = {}  # (ruta, clave) -> [lock, usuarios]
+
+    def _idempotent_paths(self, scope: Scope) -> Dict[str, int]:
+        """Rutas marcadas con @idempotent -> TTL de sus respuestas (se calculan en el primer request)."""
+        if self._paths is None:
+            self._paths = {}
+            for route in scope["app"].routes:
+                endpoint = getattr(route, "endpoint", None)
+                if getattr(endpoint, "__idempotent__", False):
+                    ttl = getattr(endpoint, "__idempotency_ttl__", None)
+                    self._paths[route.path] = ttl if ttl is not None else settings.idempotency_ttl
+        return self._paths
+
+    @asynccontextmanager
+    async def _local_lock(self, lock_key: tuple) -> AsyncIterator[None]:
+        entry = self._locks.setdefault(lock_key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[lock_key]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in self._idempotent_paths(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        key = headers.get(HEADER)
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        route = scope["path"]
+        if len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": f"Idempotency-Key admite hasta {MAX_KEY_LENGTH} caracteres"})
+            return
+
+        body = await _read_body(receive)
+        fingerprint = hashlib.sha256(
+            b"\0".join((
+                scope.get("query_string", b""),
+                headers.get("authorization", "").encode("latin-1"),
+                body,
+            ))
+        ).hexdigest()
+
+        async with self._local_lock((route, key)):
+            existing = await self._wait_for_key(route, key, fingerprint)
+            if existing == "claimed":
+                metrics.IDEMPOTENCY_REQUESTS.inc(route=route, outcome="executed")
+                await self._execute(scope, _replay_body(body, receive), send, route, key)
+                return
+
+        if existing is None:
+            metrics.IDEMPOTENCY_REQUESTS.inc(route=route, outcome="in_progress")
+            await _send_json(
+                send, 409, {"detail": "Hay un request en curso con esta Idempotency-Key"},
+                extra_headers=[(b"retry-after", b"1")],
+            )
+        elif existing.fingerprint != fingerprint:
+            metrics.IDEMPOTENCY_REQUESTS.inc(route=route, outcome="mismatch")
+            await _send_json(send, 422, {"detail": "Idempotency-Key ya usada con otro request"})
+        else:
+            metrics.IDEMPOTENCY_REQUESTS.inc(route=route, outcome="replayed")
+            await _replay(send, existing)
+
+    async def _wait_for_key(self, route: str, key: str, fingerprint: str):
+        """
+        Reclama la clave o espera a que quien la tiene termine.
+        Devuelve "claimed", la fila terminada, o None si venció la espera.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.idempotency_wait_timeout
+        interval = POLL_INTERVAL
+        while True:
+            claimed, existing = await _claim(route, key, fingerprint)
+            if claimed:
+                return "claimed"
+            if existing is not None and (
+                existing.status_code is not None or existing.fingerprint != fingerprint
+            ):
+                return existing
+            # En curso, o liberada entre el INSERT y el SELECT: se reintenta tras una pausa
+            if loop.time() >= deadline:
+                return None
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+    async def _execute(self, scope: Scope, receive: Receive, send: Send, route: str, key: str) -> None:
+        status: Optional[int] = None
+        response_headers: List[List[str]] = []
+        chunks: List[bytes] = []
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers.extend(
+                    [name.decode("latin-1"), value.decode("latin-1")] for name, value in message["headers"]
+                )
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            await _release(route, key)
+            raise
+
+        if status is None or status >= 500 or status in RETRYABLE_STATUSES:
+            await _release(route, key)
+        else:
+            await _store(route, key, status, response_headers, b"".join(chunks), self._idempotent_paths(scope)[route])
+
+
+# ======================
+# Utilidades ASGI
+# ======================
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _replay_body(body: bytes, receive: Receive) -> Receive:
+    """Entrega a la app el cuerpo ya leído; después delega (ej: http.disconnect)."""
+    sent = False
+
+    async def wrapped() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return wrapped
+
+
+async def _replay(send: Send, record: IdempotencyKey) -> None:
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in record.headers or []]
+    headers.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": record.status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": record.body or b""})
+
+
+async def _send_json(send: Send, status: int, payload: dict, extra_headers: list = ()) -> None:
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            *extra_headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
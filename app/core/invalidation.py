@@ -0,0 +1,121 @@
+"""
+Invalidación de cachés entre workers con LISTEN/NOTIFY de Postgres.
+
+- El trigger de la migración b9e4d1c7a2f5 emite
+  `NOTIFY cache_invalidation, 'users'` por cada sentencia que escribe en
+  `users` (uno solo por transacción), y se invalida el namespace completo.
+  Así también quedan cubiertas las escrituras que no pasan por el CRUD
+  (bulk, SQL a mano). El formato '<namespace>:<clave>' también se acepta
+  para invalidar una sola clave.
+- Cada worker mantiene una conexión asyncpg dedicada con LISTEN, abierta
+  desde el lifespan, y reparte cada evento a `cache.invalidate`.
+- Si la conexión se cae, las cachés se suspenden (ver app.core.cache) hasta
+  reconectar; al reconectar se vacían por completo, porque los NOTIFY
+  emitidos durante el corte se perdieron.
+- Un `SELECT 1` cada `cache_listener_heartbeat` segundos detecta conexiones
+  muertas que el socket todavía no reportó.
+
+Con una base que no es Postgres (ej: sqlite en pruebas) no hay listener:
+cada worker solo ve sus propias invalidaciones.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy.engine import make_url
+
+from app.core import cache, metrics
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+MAX_RECONNECT_DELAY = 30.0
+
+
+def _listener_dsn() -> Optional[str]:
+    """DSN para asyncpg, o None si la base no es Postgres."""
+    url = make_url(settings.database_url_async)
+    if url.get_backend_name() != "postgresql":
+        return None
+    return url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def handle_notification(payload: str) -> None:
+    """Aplica un evento '<namespace>:<clave>' (sin clave = todo el namespace)."""
+    namespace, _, key = payload.partition(":")
+    if not key:
+        cache.invalidate(namespace)
+    else:
+        cache.invalidate(namespace, [int(key) if key.isdigit() else key])
+    metrics.CACHE_INVALIDATIONS.inc(namespace=namespace)
+
+
+# ======================
+# Listener
+# ======================
+class InvalidationListener:
+    def __init__(self, dsn: str, heartbeat: float):
+        self.dsn = dsn
+        self.heartbeat = heartbeat
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            handle_notification(payload)
+        except Exception as e:
+            # Evento ilegible: se vacía todo antes que arriesgar datos viejos
+            logger.warning(f"Evento de invalidación inválido ({payload!r}): {e}")
+            cache.clear_all()
+
+    async def run(self) -> None:
+        """Corre hasta ser cancelada, reconectando con backoff."""
+        import asyncpg  # Diferido: solo los workers con Postgres cargan el driver
+
+        delay = 1.0
+        while True:
+            connection = None
+            lost = asyncio.Event()
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(CHANNEL, self._on_notify)
+
+                # Lo que cambió durante el corte no llegó: se vacía todo y se reanuda
+                cache.clear_all()
+                cache.set_coherent(True)
+                metrics.CACHE_LISTENER_CONNECTED.set(1)
+                logger.info(f"Escuchando invalidaciones de caché en '{CHANNEL}'")
+                delay = 1.0
+
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=self.heartbeat)
+                    except asyncio.TimeoutError:
+                        await asyncio.wait_for(connection.fetchval("SELECT 1"), timeout=self.heartbeat)
+                raise ConnectionError("conexión cerrada")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                cache.set_coherent(False)
+                metrics.CACHE_LISTENER_CONNECTED.set(0)
+                metrics.CACHE_LISTENER_RECONNECTS.inc()
+                logger.warning(f"Listener de invalidación caído ({e}); reintento en {delay:.0f}s")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    connection.terminate()
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+def start_listener() -> Optional[asyncio.Task]:
+    """Lanza el listener en el loop actual (llamar desde el lifespan), si la base es Postgres."""
+    dsn = _listener_dsn()
+    if dsn is None:
+        logger.info("Invalidación entre workers desactivada: la base no es Postgres")
+        return None
+    # Hasta la primera conexión no hay garantía de coherencia
+    cache.set_coherent(False)
+    listener = InvalidationListener(dsn, settings.cache_listener_heartbeat)
+    return asyncio.create_task(listener.run(), name="cache-invalidation")
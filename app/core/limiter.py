@@ -18,7 +18,8 @@ def custom_key_func(request: Request) -> str:
 
 limiter = Limiter(
     key_func=custom_key_func,
-    default_limits=[f"{settings.rate_limit_requests}/{settings.rate_limit_minutes}minute"]
+    default_limits=[f"{settings.rate_limit_requests}/{settings.rate_limit_minutes}minute"],
+    enabled=settings.rate_limit_enabled,
 )
 
 __all__ = ["limiter"]
@@ -1,43 +1,265 @@
-from loguru import logger
+"""
+Pipeline único de logging basado en loguru.
+
+- `setup_logging()` redirige el logging estándar (la app, uvicorn,
+  SQLAlchemy) a loguru mediante InterceptHandler: todo sale por los mismos
+  sinks y con el mismo formato.
+- Cada registro lleva `request_id` (RequestIdMiddleware, header
+  X-Request-ID) y `trace_id` (app.core.tracing).
+- Los sinks usan `enqueue=True`: la escritura la hace un hilo de fondo,
+  no el event loop.
+- Salida JSON por línea con `log_json` (por defecto fuera de desarrollo).
+- Por debajo de ERROR, cada logger tiene un límite de registros por
+  segundo (`log_rate_limit` / `log_rate_burst`); lo que se descarta se
+  informa en el siguiente registro aceptado como `suppressed`. Los eventos
+  ruidosos se muestrean por nombre de evento (`log_sample_rates`, ej:
+  "jwt_decode_failed=0.01"), marcándolos con `extra={"event": ...}`.
+- `diagnose` (valores de variables en los tracebacks) solo en desarrollo.
+
+Importar el módulo no configura nada: `setup_logging()` se llama desde el
+lifespan (o desde el `__main__` de cada CLI) y recién ahí crea `logs/`.
+"""
+import inspect
+import json
+import logging
+import random
 import sys
+import threading
+import time
+import traceback
+import uuid
+from contextvars import ContextVar
 from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+from app.core.tracing import current_trace_id
+
+settings = get_settings()
 
 LOG_DIR = Path("logs")
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 ERROR_LOG_FILE = LOG_DIR / "errors.log"
+SLOW_QUERY_LOG_FILE = LOG_DIR / "slow_queries.log"
 
 LOG_FORMAT = (
     "<green>{time:YYYY-MM-DD HH:mm:ss}</green> "
     "<level>{level}</level> - "
-    "<cyan>{name}:{function}:{line}</cyan> - "
+    "<cyan>{extra[logger]}:{function}:{line}</cyan> - "
     "→ {message} | "
-    "Extra: {extra}"
+    "Extra: {extra[_public]}"
 )
 
-logger.remove()
-
-# Agrega sink para errores en archivo
-logger.add(
-    str(ERROR_LOG_FILE),
-    level="ERROR",
-    format=LOG_FORMAT,
-    enqueue=True,
-    rotation="10 MB",
-    retention="10 days",
-    compression="zip",
-    backtrace=True,
-    diagnose=True
-)
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+# ======================
+# Muestreo y límite por logger
+# ======================
+class _RateLimiter:
+    """Token bucket por (logger, nivel), compartido por todos los hilos."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str], list] = {}  # clave -> [tokens, último refill, suprimidos]
+
+    def allow(self, key: Tuple[str, str]) -> Tuple[bool, int]:
+        """Devuelve (se acepta, cuántos se suprimieron desde el último aceptado)."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.setdefault(key, [float(self.burst), now, 0])
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False, 0
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+            return True, suppressed
+
+
+def _parse_sample_rates(value: str) -> Dict[str, float]:
+    rates = {}
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        event, _, rate = part.partition("=")
+        rates[event.strip()] = float(rate)
+    return rates
+
+
+_limiter = _RateLimiter(settings.log_rate_limit, settings.log_rate_burst)
+_sample_rates = _parse_sample_rates(settings.log_sample_rates)
+
+
+def _patch(record) -> None:
+    """Se ejecuta una vez por registro, antes de los sinks: contexto + decisión de descarte."""
+    extra = record["extra"]
+    extra.setdefault("logger", record["name"])
+    extra["request_id"] = _request_id.get()
+    extra["trace_id"] = current_trace_id()
+
+    if record["level"].no < logging.ERROR:
+        rate = _sample_rates.get(extra.get("event"))
+        if rate is not None and random.random() >= rate:
+            extra["_drop"] = True
+        elif settings.log_rate_limit > 0:
+            allowed, suppressed = _limiter.allow((extra["logger"], record["level"].name))
+            if not allowed:
+                extra["_drop"] = True
+            elif suppressed:
+                extra["suppressed"] = suppressed
+
+    extra["_public"] = {k: v for k, v in extra.items() if not k.startswith("_")}
+
+
+def _keep(record) -> bool:
+    return not record["extra"].get("_drop")
+
+
+# ======================
+# Formatos
+# ======================
+def _json_format(record) -> str:
+    payload = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "function": record["function"],
+        "line": record["line"],
+        **record["extra"]["_public"],
+    }
+    if record["exception"] is not None:
+        exc_type, exc_value, exc_tb = record["exception"]
+        payload["exception"] = "".join(traceback.format_exception(exc_type, exc_value, exc_tb))
+    record["extra"]["_json"] = json.dumps(payload, default=str, ensure_ascii=False)
+    return "{extra[_json]}\n"
+
+
+# ======================
+# Puente stdlib -> loguru
+# ======================
+class InterceptHandler(logging.Handler):
+    """Reenvía los registros de `logging` a loguru conservando nivel, origen y excepción."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+
+        # Sube hasta el primer frame fuera de `logging` para reportar el origen real
+        frame, depth = inspect.currentframe(), 0
+        while frame is not None and (depth == 0 or frame.f_code.co_filename == logging.__file__):
+            frame = frame.f_back
+            depth += 1
+
+        bound = logger.bind(logger=record.name)
+        event = getattr(record, "event", None)
+        if event is not None:
+            bound = bound.bind(event=event)
+        bound.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+
+
+def setup_logging() -> None:
+    """Configura loguru y redirige el logging estándar. Idempotente."""
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    development = settings.app_env == "development"
+    use_json = settings.log_json if settings.log_json is not None else not development
+    level = settings.log_level.upper()
+
+    logger.remove()
+    logger.configure(patcher=_patch)
+
+    # Salida principal (stderr), escrita desde un hilo de fondo
+    logger.add(
+        sys.stderr,
+        level=level,
+        format=_json_format if use_json else LOG_FORMAT,
+        filter=_keep,
+        enqueue=True,
+        backtrace=development,
+        diagnose=development,
+        colorize=None if not use_json else False,
+    )
+
+    # Errores en archivo
+    logger.add(
+        str(ERROR_LOG_FILE),
+        level="ERROR",
+        format=_json_format if use_json else LOG_FORMAT,
+        enqueue=True,
+        rotation="10 MB",
+        retention="10 days",
+        compression="zip",
+        backtrace=development,
+        diagnose=development,
+    )
+
+    # Sink dedicado para el log de consultas lentas (app/core/profiling.py)
+    logger.add(
+        str(SLOW_QUERY_LOG_FILE),
+        level="WARNING",
+        format=_json_format if use_json else LOG_FORMAT,
+        filter=lambda record: record["extra"].get("channel") == "slow_sql" and _keep(record),
+        enqueue=True,
+        rotation="10 MB",
+        retention="10 days",
+        compression="zip",
+    )
+
+    # Todo el logging estándar pasa por loguru
+    logging.basicConfig(handlers=[InterceptHandler()], level=level, force=True)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access", "sqlalchemy.engine"):
+        stdlib_logger = logging.getLogger(name)
+        stdlib_logger.handlers = []
+        stdlib_logger.propagate = True
+    if settings.sql_echo:
+        logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+
+
+# ======================
+# Middleware
+# ======================
+class RequestIdMiddleware:
+    """Toma X-Request-ID del request (o genera uno) y lo devuelve en la respuesta."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming[:128] if incoming else uuid.uuid4().hex
+        token = _request_id.set(request_id)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_id.reset(token)
 
-# Opcional: salida estándar para errors, útil en desarrollo
-logger.add(sys.stderr, level="ERROR", format=LOG_FORMAT)
 
-__all__ = ["logger"]
+__all__ = ["logger", "setup_logging", "current_request_id", "RequestIdMiddleware"]
 
 """
 Ejemplo de uso en la app:
 
-from core.logger import logger
+from app.core.logger import logger
 
 logger.error(
     "Mensaje de error con contexto",
@@ -0,0 +1,151 @@
+"""
+Monitor de lag del event loop y profiler de muestreo bajo demanda.
+
+- LoopMonitor: tarea de fondo (lifespan) que mide cuánto se atrasa el loop
+  respecto del intervalo esperado. Un hilo watchdog detecta cuando el loop
+  lleva bloqueado más de `loop_lag_threshold_ms` y registra el stack del
+  hilo del loop en ese momento (quién lo está bloqueando).
+- sample_stacks: profiler de muestreo sobre el hilo del loop; el endpoint
+  de admin devuelve el resultado en formato "collapsed stacks", listo para
+  flamegraph.pl / speedscope / inferno.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.core import metrics
+from app.core.config import get_settings
+from app.modules.user.dependencies import get_current_superuser
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+# ======================
+# Monitor de lag
+# ======================
+class LoopMonitor:
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self.loop_thread_id: Optional[int] = None
+        self._last_tick = time.monotonic()
+        self._reported_tick: Optional[float] = None
+        self._stop = threading.Event()
+
+    async def run(self) -> None:
+        """Corre dentro del event loop hasta ser cancelada."""
+        self.loop_thread_id = threading.get_ident()
+        watchdog = threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                tick = time.monotonic()
+                self._last_tick = tick
+                await asyncio.sleep(self.interval)
+                lag = max(time.monotonic() - tick - self.interval, 0.0)
+                metrics.EVENT_LOOP_LAG.observe(lag)
+        finally:
+            self._stop.set()
+
+    def _watchdog(self) -> None:
+        """Hilo aparte: si el loop no avanza, captura el stack que lo bloquea."""
+        check_every = max(self.threshold / 2, 0.01)
+        while not self._stop.wait(check_every):
+            tick = self._last_tick
+            blocked_for = time.monotonic() - tick - self.interval
+            if blocked_for < self.threshold or self._reported_tick == tick:
+                continue
+            self._reported_tick = tick  # Un reporte por bloqueo
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            metrics.EVENT_LOOP_STALLS.inc()
+            logger.warning(
+                "Event loop bloqueado más de %.0f ms. Stack actual del loop:\n%s",
+                blocked_for * 1000, stack,
+            )
+
+
+monitor: Optional[LoopMonitor] = None
+
+
+def start_monitor() -> asyncio.Task:
+    """Crea y lanza el monitor en el loop actual (llamar desde el lifespan)."""
+    global monitor
+    monitor = LoopMonitor(
+        interval=settings.loop_monitor_interval_ms / 1000,
+        threshold=settings.loop_lag_threshold_ms / 1000,
+    )
+    return asyncio.create_task(monitor.run(), name="loop-monitor")
+
+
+# ======================
+# Profiler de muestreo
+# ======================
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{frame.f_lineno})"
+
+
+def sample_stacks(thread_id: int, seconds: float, interval: float) -> Counter:
+    """
+    Muestrea el stack de `thread_id` cada `interval` segundos durante `seconds`.
+    Devuelve un Counter de stacks colapsados ("raíz;...;hoja" -> muestras).
+    Debe correr en un hilo distinto al muestreado.
+    """
+    samples: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            samples[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return samples
+
+
+def render_collapsed(samples: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+router = APIRouter()
+_profile_lock = asyncio.Lock()
+
+
+@router.get("/debug/profile", response_class=PlainTextResponse)
+async def profile_endpoint(
+    seconds: float = Query(10.0, gt=0, description="Duración del muestreo en segundos"),
+    interval_ms: float = Query(5.0, ge=1, le=1000, description="Intervalo entre muestras"),
+    current_user=Depends(get_current_superuser),
+):
+    """
+    Perfila este worker durante `seconds` y devuelve los stacks del event
+    loop en formato collapsed (una línea "frame;frame;... N" por stack).
+    Solo superusuarios. Un perfil a la vez por worker.
+    """
+    if seconds > settings.profiler_max_seconds:
+        raise HTTPException(status_code=400, detail=f"Máximo {settings.profiler_max_seconds} segundos")
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="Ya hay un perfil en curso en este worker")
+
+    async with _profile_lock:
+        # El muestreo corre en otro hilo: el loop sigue atendiendo requests mientras tanto
+        samples = await asyncio.to_thread(sample_stacks, threading.get_ident(), seconds, interval_ms / 1000)
+
+    return PlainTextResponse(
+        render_collapsed(samples),
+        headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'},
+    )
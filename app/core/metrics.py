@@ -0,0 +1,420 @@
+"""
+Métricas en formato de exposición de Prometheus, sin dependencias externas.
+
+- Counter, Gauge e Histogram con etiquetas, guardados en memoria por proceso.
+- Con varios workers, cada proceso vuelca periódicamente su snapshot a
+  `settings.metrics_dir/<pid>.json`; el endpoint de exposición mezcla los
+  snapshots de todos los workers vivos (suma de contadores, histogramas y
+  gauges) para que cualquier worker responda con el total.
+- Al apagarse, cada worker acumula sus contadores e histogramas en
+  `retired.json` para que los totales no retrocedan al reciclar workers.
+- MetricsMiddleware registra latencia y códigos de estado por ruta.
+
+Uso:
+
+    from app.core import metrics
+
+    with metrics.PASSWORD_HASH_SECONDS.time(operation="hash"):
+        ...
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+settings = get_settings()
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelKey = Tuple[str, ...]
+
+
+# ======================
+# Tipos de métrica
+# ======================
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, object] = {}
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, object]) -> LabelKey:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: se esperaban las etiquetas {self.labelnames}, llegaron {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = {
+                json.dumps(list(key)): list(value) if isinstance(value, list) else value
+                for key, value in self._values.items()
+            }
+        return {"type": self.type, "help": self.documentation, "labels": list(self.labelnames), "samples": samples}
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # [conteo por bucket..., +Inf, suma]
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[len(self.buckets)] += 1
+            data[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> dict:
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+# ======================
+# Registro
+# ======================
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def register_collector(self, collector: Callable[[], None]) -> None:
+        """Función que actualiza gauges justo antes de cada snapshot (ej: estado del pool)."""
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, dict]:
+        for collector in self._collectors:
+            collector()
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+REGISTRY = Registry()
+register_collector = REGISTRY.register_collector
+
+
+# ======================
+# Agregación entre workers
+# ======================
+RETIRED_FILE = "retired.json"
+
+
+def _snapshot_path(pid: int) -> Path:
+    return Path(settings.metrics_dir) / f"{pid}.json"
+
+
+def write_snapshot() -> None:
+    """Vuelca el snapshot de este worker a disco (escritura atómica)."""
+    if not settings.metrics_dir:
+        return
+    path = _snapshot_path(os.getpid())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(REGISTRY.snapshot()))
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(target: Dict[str, dict], snapshot: Dict[str, dict]) -> None:
+    for name, metric in snapshot.items():
+        merged = target.setdefault(name, {**metric, "samples": {}})
+        for key, value in metric["samples"].items():
+            current = merged["samples"].get(key)
+            if current is None:
+                merged["samples"][key] = value
+            elif isinstance(value, list):
+                merged["samples"][key] = [a + b for a, b in zip(current, value)]
+            else:
+                merged["samples"][key] = current + value
+
+
+def collect() -> Dict[str, dict]:
+    """Snapshot agregado: este proceso más los snapshots de los demás workers vivos."""
+    if not settings.metrics_dir:
+        return REGISTRY.snapshot()
+
+    write_snapshot()
+    merged: Dict[str, dict] = {}
+    retired = Path(settings.metrics_dir) / RETIRED_FILE
+    if retired.exists():
+        try:
+            _merge(merged, json.loads(retired.read_text()))
+        except (OSError, json.JSONDecodeError):
+            pass
+    for path in Path(settings.metrics_dir).glob("*.json"):
+        try:
+            pid = int(path.stem)
+        except ValueError:
+            continue
+        if not _pid_alive(pid):
+            path.unlink(missing_ok=True)
+            continue
+        try:
+            _merge(merged, json.loads(path.read_text()))
+        except (OSError, json.JSONDecodeError):
+            continue
+    return merged
+
+
+# ======================
+# Formato de exposición
+# ======================
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_float(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def render(snapshot: Dict[str, dict]) -> str:
+    lines: List[str] = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for key in sorted(metric["samples"]):
+            values = json.loads(key)
+            sample = metric["samples"][key]
+            if metric["type"] == "histogram":
+                buckets = metric["buckets"]
+                for bound, count in zip(buckets + [float("inf")], sample[:-1]):
+                    lines.append(f"{name}_bucket{_labels(metric['labels'], values, ('le', _format_float(bound)))} {count}")
+                lines.append(f"{name}_sum{_labels(metric['labels'], values)} {_format_float(sample[-1])}")
+                lines.append(f"{name}_count{_labels(metric['labels'], values)} {sample[-2]}")
+            else:
+                lines.append(f"{name}{_labels(metric['labels'], values)} {_format_float(sample)}")
+    return "\n".join(lines) + "\n"
+
+
+async def flush_periodically() -> None:
+    """Tarea de fondo (lifespan): mantiene actualizado el snapshot de este worker."""
+    while True:
+        await asyncio.sleep(settings.metrics_flush_interval)
+        await asyncio.to_thread(write_snapshot)
+
+
+def _retire_snapshot() -> None:
+    """Suma los contadores e histogramas de este worker a retired.json (los gauges no se acumulan)."""
+    directory = Path(settings.metrics_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    own = {name: metric for name, metric in REGISTRY.snapshot().items() if metric["type"] != "gauge"}
+    with open(directory / f"{RETIRED_FILE}.lock", "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        retired = directory / RETIRED_FILE
+        merged: Dict[str, dict] = {}
+        if retired.exists():
+            try:
+                merged = json.loads(retired.read_text())
+            except (OSError, json.JSONDecodeError):
+                merged = {}
+        _merge(merged, own)
+        tmp = retired.with_suffix(".tmp")
+        tmp.write_text(json.dumps(merged))
+        os.replace(tmp, retired)
+
+
+def remove_snapshot() -> None:
+    """Al apagarse: acumula los totales de este worker y borra su snapshot."""
+    if settings.metrics_dir:
+        _retire_snapshot()
+        _snapshot_path(os.getpid()).unlink(missing_ok=True)
+
+
+# ======================
+# Métricas de la aplicación
+# ======================
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Requests HTTP atendidos", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Latencia de requests HTTP por ruta", ("method", "route")
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Tiempo esperando una conexión del pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Conexiones del pool por estado", ("state",)
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_seconds",
+    "Duración de operaciones Argon2",
+    ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0),
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total", "Requests rechazados por rate limit", ("route",)
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Atraso del event loop respecto del intervalo esperado",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+EVENT_LOOP_STALLS = Counter(
+    "event_loop_stalls_total", "Bloqueos del event loop por encima del umbral"
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests HTTP en curso"
+)
+DRAIN_SECONDS = Histogram(
+    "shutdown_drain_seconds",
+    "Duración del drenado de requests al apagar un worker",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+DRAIN_ABANDONED_REQUESTS = Counter(
+    "shutdown_abandoned_requests_total", "Requests todavía en curso al vencer el plazo de drenado"
+)
+CACHE_INVALIDATIONS = Counter(
+    "cache_invalidations_total", "Eventos de invalidación recibidos por LISTEN/NOTIFY", ("namespace",)
+)
+CACHE_LISTENER_CONNECTED = Gauge(
+    "cache_listener_connected", "1 si el listener de invalidación está conectado"
+)
+CACHE_LISTENER_RECONNECTS = Counter(
+    "cache_listener_reconnects_total", "Caídas del listener de invalidación"
+)
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total",
+    "Requests con Idempotency-Key por resultado (executed, replayed, in_progress, mismatch)",
+    ("route", "outcome"),
+)
+
+
+# ======================
+# Middleware
+# ======================
+class MetricsMiddleware:
+    """Middleware ASGI puro: latencia y status por plantilla de ruta (no por URL concreta)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=path)
+            HTTP_REQUESTS.inc(method=method, route=path, status=status)
+
+
+# ======================
+# Endpoint de exposición
+# ======================
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Métricas de todos los workers en formato Prometheus."""
+    snapshot = await asyncio.to_thread(collect)
+    return PlainTextResponse(render(snapshot), media_type=CONTENT_TYPE)
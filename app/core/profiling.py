@@ -0,0 +1,157 @@
+"""
+Profiler SQL por request (opt-in) con detección de N+1 y log de consultas lentas.
+
+- Escucha los eventos de cursor del engine: cada sentencia se cronometra.
+- En los requests muestreados (`sql_profile_sample_rate`) acumula cantidad
+  de sentencias y tiempo total de BD, los devuelve en el header
+  `Server-Timing` y deja un registro al terminar el request.
+- Las sentencias idénticas repetidas `sql_n_plus_one_threshold` veces o más
+  dentro de un mismo request se reportan como sospechosas de N+1.
+- Las sentencias más lentas que `sql_slow_query_ms` van al log de consultas
+  lentas (logs/slow_queries.log), opcionalmente con su EXPLAIN.
+"""
+import logging
+import random
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+from app.core.logger import logger as loguru_logger
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+slow_query_logger = loguru_logger.bind(channel="slow_sql")
+
+
+class RequestProfile:
+    """Estadísticas SQL acumuladas durante un request."""
+
+    __slots__ = ("statements", "db_time", "counts")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.counts: Counter = Counter()
+
+    def n_plus_one_suspects(self, threshold: int):
+        return [(statement, count) for statement, count in self.counts.most_common() if count >= threshold]
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current_profile.get()
+
+
+# ======================
+# Eventos del engine
+# ======================
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.statements += 1
+        profile.db_time += elapsed
+        profile.counts[statement] += 1
+
+    if elapsed * 1000 >= settings.sql_slow_query_ms:
+        _log_slow_query(conn, statement, parameters, elapsed)
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute no se llama si la sentencia falla: descartamos su marca de inicio
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+def _log_slow_query(conn, statement: str, parameters, elapsed: float) -> None:
+    plan = None
+    if settings.sql_slow_query_explain and statement.lstrip().upper().startswith("SELECT"):
+        try:
+            explain_cursor = conn.connection.dbapi_connection.cursor()
+            explain_cursor.execute(f"EXPLAIN {statement}", parameters)
+            plan = "\n".join(" ".join(str(col) for col in row) for row in explain_cursor.fetchall())
+            explain_cursor.close()
+        except Exception as e:  # El EXPLAIN nunca debe romper la consulta original
+            plan = f"(EXPLAIN falló: {e})"
+
+    slow_query_logger.warning(
+        "Consulta lenta ({ms:.1f} ms): {statement}",
+        ms=elapsed * 1000,
+        statement=statement,
+        parameters=repr(parameters),
+        plan=plan,
+    )
+
+
+def install(engine: AsyncEngine) -> None:
+    """Registra los listeners en el engine (una sola vez)."""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+# ======================
+# Middleware
+# ======================
+class SQLProfilerMiddleware:
+    """
+    Activa el perfil SQL en una fracción de los requests y lo expone como
+    header `Server-Timing: db;dur=<ms>;desc="<n> queries"`.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or random.random() >= settings.sql_profile_sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={profile.db_time * 1000:.1f};desc="{profile.statements} queries"',
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            self._report(scope, profile)
+
+    @staticmethod
+    def _report(scope: Scope, profile: RequestProfile) -> None:
+        route = getattr(scope.get("route"), "path", scope.get("path"))
+        logger.info(
+            "SQL %s %s: %d sentencias, %.1f ms en BD",
+            scope["method"], route, profile.statements, profile.db_time * 1000,
+        )
+        for statement, count in profile.n_plus_one_suspects(settings.sql_n_plus_one_threshold):
+            logger.warning(
+                "Posible N+1 en %s %s: sentencia repetida %d veces: %s",
+                scope["method"], route, count, statement,
+            )
@@ -0,0 +1,246 @@
+"""
+Runner de producción: supervisor de workers uvicorn con la app precargada.
+
+- El proceso maestro importa la app una sola vez (preload), abre el socket
+  con `server_backlog` y hace fork de `workers` procesos que comparten ese
+  socket (copy-on-write: el código importado no se duplica en memoria).
+- Cada worker corre uvicorn con uvloop + httptools cuando están
+  instalados (loop/http "auto") y `server_keep_alive` segundos de keep-alive.
+- `workers = 0` usa la cantidad de CPUs realmente disponibles: afinidad del
+  proceso (taskset / cpuset) acotada por la cuota de CPU del cgroup.
+- Un worker se recicla al llegar a `worker_max_requests` (+ jitter, para
+  que no se reinicien todos juntos) o al superar `worker_max_memory_mb` de
+  RSS; el reemplazo arranca antes de que el viejo empiece a drenar.
+- SIGTERM / SIGINT al maestro: SIGTERM a cada worker (que drena, ver
+  app.core.draining) y SIGKILL a los que no terminen a tiempo.
+
+En Windows no hay fork: se delega en el supervisor de uvicorn (`workers=`),
+sin preload.
+
+Uso:
+
+    python main.py                  # con DEBUG=False
+    python -m app.core.server
+"""
+import logging
+import math
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional
+
+import uvicorn
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL = 1.0  # Segundos entre revisiones del supervisor
+
+
+# ======================
+# Dimensionamiento
+# ======================
+def _cgroup_cpu_limit() -> Optional[float]:
+    """CPUs permitidas por la cuota del cgroup (v2 o v1), o None si no hay límite."""
+    try:
+        quota, period = open("/sys/fs/cgroup/cpu.max").read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read())
+        period = int(open("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, max(1, math.ceil(limit)))
+    return cpus
+
+
+def worker_count() -> int:
+    return settings.workers or available_cpus()
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    """RSS del proceso en MB leyendo /proc (None si no está disponible)."""
+    try:
+        with open(f"/proc/{pid}/status") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+# ======================
+# Worker
+# ======================
+def _uvicorn_config(app) -> uvicorn.Config:
+    max_requests = None
+    if settings.worker_max_requests:
+        max_requests = settings.worker_max_requests + random.randint(0, settings.worker_max_requests_jitter)
+    return uvicorn.Config(
+        app,
+        loop="auto",  # uvloop si está instalado
+        http="auto",  # httptools si está instalado
+        backlog=settings.server_backlog,
+        timeout_keep_alive=settings.server_keep_alive,
+        timeout_graceful_shutdown=math.ceil(settings.drain_timeout),
+        limit_max_requests=max_requests,
+        log_level=settings.log_level.lower(),
+        log_config=None,  # Los loggers de uvicorn van al pipeline de app.core.logger
+        access_log=settings.server_access_log,
+    )
+
+
+def _run_worker(app, sock: socket.socket) -> None:
+    """Punto de entrada del proceso hijo (después del fork)."""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    # El pool heredado del maestro (si llegó a crearse) no debe reutilizarse en el hijo
+    from app.core.database import dispose_inherited_engine
+    dispose_inherited_engine()
+
+    server = uvicorn.Server(_uvicorn_config(app))
+    server.run(sockets=[sock])
+
+
+# ======================
+# Supervisor
+# ======================
+class Supervisor:
+    def __init__(self, app, workers: int):
+        self.app = app
+        self.workers = workers
+        self.context = multiprocessing.get_context("fork")
+        self.sock = self._bind()
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.retiring: Dict[int, float] = {}  # pid -> deadline para SIGKILL
+        self.should_exit = False
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET6 if ":" in settings.server_host else socket.AF_INET)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((settings.server_host, settings.server_port))
+        sock.listen(settings.server_backlog)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self) -> None:
+        process = self.context.Process(target=_run_worker, args=(self.app, self.sock), name="uvicorn-worker")
+        process.start()
+        self.processes[process.pid] = process
+        logger.info(f"Worker {process.pid} iniciado")
+
+    def _retire(self, pid: int, reason: str) -> None:
+        """Arranca un reemplazo y pide al worker que drene y salga."""
+        if pid in self.retiring:
+            return
+        logger.warning(f"Reciclando worker {pid}: {reason}")
+        self._spawn()
+        self.retiring[pid] = time.monotonic() + settings.drain_timeout + 10
+        os.kill(pid, signal.SIGTERM)
+
+    def _handle_exit(self, signum, frame) -> None:
+        self.should_exit = True
+
+    def _check(self) -> None:
+        for pid, process in list(self.processes.items()):
+            if not process.is_alive():
+                process.join()
+                del self.processes[pid]
+                retired = self.retiring.pop(pid, None) is not None
+                if not retired:
+                    # Salida por max_requests (código 0) o caída: se reemplaza
+                    logger.info(f"Worker {pid} terminó (exit {process.exitcode}), reemplazando")
+                    self._spawn()
+                continue
+
+            if pid in self.retiring:
+                if time.monotonic() > self.retiring[pid]:
+                    os.kill(pid, signal.SIGKILL)
+                continue
+
+            if settings.worker_max_memory_mb:
+                rss = _rss_mb(pid)
+                if rss is not None and rss > settings.worker_max_memory_mb:
+                    self._retire(pid, f"RSS {rss:.0f} MB > {settings.worker_max_memory_mb} MB")
+
+    def _shutdown(self) -> None:
+        logger.info("Apagando workers")
+        for process in self.processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        deadline = time.monotonic() + settings.drain_timeout + 10
+        for process in self.processes.values():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning(f"Worker {process.pid} no terminó a tiempo, SIGKILL")
+                process.kill()
+                process.join()
+        self.sock.close()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._handle_exit)
+        signal.signal(signal.SIGINT, self._handle_exit)
+        logger.info(
+            f"Supervisor {os.getpid()}: {self.workers} workers en "
+            f"{settings.server_host}:{settings.server_port} (backlog {settings.server_backlog})"
+        )
+        for _ in range(self.workers):
+            self._spawn()
+        while not self.should_exit:
+            time.sleep(CHECK_INTERVAL)
+            self._check()
+        self._shutdown()
+
+
+def run(app=None) -> None:
+    """Arranca el servidor de producción. `app` se importa de main si no se pasa."""
+    if app is None:
+        from main import app
+
+    workers = worker_count()
+    if "fork" not in multiprocessing.get_all_start_methods():
+        uvicorn.run(
+            "main:app",
+            host=settings.server_host,
+            port=settings.server_port,
+            workers=workers,
+            backlog=settings.server_backlog,
+            timeout_keep_alive=settings.server_keep_alive,
+            limit_max_requests=settings.worker_max_requests or None,
+            log_level=settings.log_level.lower(),
+            access_log=settings.server_access_log,
+        )
+        return
+
+    Supervisor(app, workers).run()
+
+
+if __name__ == "__main__":
+    from app.core.logger import setup_logging
+
+    setup_logging()
+    sys.exit(run())
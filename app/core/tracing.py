@@ -0,0 +1,373 @@
+"""
+Tracing local y liviano de requests.
+
+- Cada request muestreado abre un span raíz (TracingMiddleware); el
+  trace_id viaja en un ContextVar, así que los spans hijos (funciones
+  decoradas con @traced y sentencias SQL) se enganchan solos.
+- Respeta el header W3C `traceparent` entrante y devuelve `X-Trace-Id`.
+- Los spans terminados se exportan desde un hilo de fondo a un archivo
+  JSONL rotativo o, si `tracing_otlp_endpoint` está definido, a un
+  colector OTLP/HTTP (JSON).
+
+Uso:
+
+    from app.core.tracing import traced
+
+    @traced()
+    async def get_user_by_id(...):
+        ...
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+# ======================
+# Spans
+# ======================
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, **attributes: Any):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = attributes
+        self.error: Optional[str] = None
+
+    def child(self, name: str, **attributes: Any) -> "Span":
+        return Span(name, self.trace_id, self.span_id, **attributes)
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+        _exporter.submit(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_unix_nano": self.start_ns,
+            "end_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+@contextmanager
+def start_span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Abre un span hijo del span actual. Fuera de un request muestreado no
+    hace nada (devuelve None), para que el costo sea mínimo.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    span = parent.child(name, **attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def traced(name: Optional[str] = None):
+    """Decorador que envuelve una función (sync o async) en un span."""
+
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return await func(*args, **kwargs)
+                with start_span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with start_span(span_name):
+                return func(*args, **kwargs)
+        return sync_wrapper
+
+    return decorator
+
+
+# ======================
+# Exportación
+# ======================
+class _SpanExporter:
+    """Exporta spans desde un hilo de fondo para no bloquear el event loop."""
+
+    BATCH_SIZE = 512
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=10000)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def submit(self, span: Span) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        batch: List[Span] = []
+        deadline = time.monotonic() + self.FLUSH_INTERVAL
+        while True:
+            try:
+                span = self._queue.get(timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Empty:
+                span = ...
+            if span is None:  # señal de apagado
+                self._export(batch)
+                return
+            if span is not ...:
+                batch.append(span)
+            if len(batch) >= self.BATCH_SIZE or time.monotonic() >= deadline:
+                self._export(batch)
+                batch = []
+                deadline = time.monotonic() + self.FLUSH_INTERVAL
+
+    def _export(self, batch: List[Span]) -> None:
+        if not batch:
+            return
+        try:
+            if settings.tracing_otlp_endpoint:
+                _export_otlp(batch)
+            else:
+                _export_jsonl(batch)
+        except Exception as e:
+            logger.warning(f"No se pudieron exportar {len(batch)} spans: {e}")
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+
+def _export_jsonl(batch: List[Span]) -> None:
+    path = Path(settings.tracing_export_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists() and path.stat().st_size >= settings.tracing_max_bytes:
+        # Rotación: traces.jsonl -> traces.jsonl.1 -> ... -> traces.jsonl.N (se descarta)
+        for index in range(settings.tracing_backup_count - 1, 0, -1):
+            older = path.with_name(f"{path.name}.{index}")
+            if older.exists():
+                os.replace(older, path.with_name(f"{path.name}.{index + 1}"))
+        os.replace(path, path.with_name(f"{path.name}.1"))
+    with path.open("a", encoding="utf-8") as handle:
+        for span in batch:
+            handle.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _export_otlp(batch: List[Span]) -> None:
+    spans = []
+    for span in batch:
+        item = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 2 if span.parent_id is None else 1,  # SERVER / INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            item["parentSpanId"] = span.parent_id
+        spans.append(item)
+
+    body = {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": settings.app_name}},
+                {"key": "service.version", "value": {"stringValue": settings.app_version}},
+            ]},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}],
+        }]
+    }
+    request = urllib.request.Request(
+        settings.tracing_otlp_endpoint.rstrip("/") + "/v1/traces",
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        response.read()
+
+
+_exporter = _SpanExporter()
+
+
+def shutdown() -> None:
+    """Exporta los spans pendientes (llamar en el shutdown del lifespan)."""
+    _exporter.shutdown()
+
+
+# ======================
+# Spans de sentencias SQL
+# ======================
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current_span.get()
+    if parent is not None:
+        conn.info.setdefault("trace_spans", []).append(parent.child("db.statement", statement=statement))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_span.get() is not None and conn.info.get("trace_spans"):
+        conn.info["trace_spans"].pop().end()
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and _current_span.get() is not None and conn.info.get("trace_spans"):
+        span = conn.info["trace_spans"].pop()
+        span.error = repr(exception_context.original_exception)
+        span.end()
+
+
+def install(engine: AsyncEngine) -> None:
+    """Registra los listeners SQL en el engine (una sola vez)."""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+# ======================
+# Middleware
+# ======================
+def _parse_traceparent(value: Optional[str]):
+    """Devuelve (trace_id, parent_span_id, sampled) de un header W3C traceparent válido."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 0x01)
+
+
+class TracingMiddleware:
+    """Abre el span raíz del request y decide el muestreo."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        incoming = _parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        if incoming:
+            trace_id, parent_id, sampled = incoming
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+            sampled = random.random() < settings.tracing_sample_rate
+
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        span = Span(f"{scope['method']} {scope['path']}", trace_id, parent_id, **{"http.method": scope["method"]})
+        token = _current_span.set(span)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                span.attributes["http.status_code"] = message["status"]
+                MutableHeaders(scope=message).append("X-Trace-Id", trace_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                # Nombre por plantilla de ruta (baja cardinalidad), ej: GET /api/v1/users/users/{user_id}
+                span.name = f"{scope['method']} {route.path}"
+                span.attributes["http.route"] = route.path
+            span.attributes["http.target"] = scope["path"]
+            _current_span.reset(token)
+            span.end()
@@ -1,38 +1,119 @@
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
-from typing import Optional
+from typing import Optional, List, Sequence
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import update, or_, func
+import asyncio
 import logging
+import os
+import uuid
 
 from app.core.config import get_settings
+from app.core import health, metrics
+from app.core.tracing import traced
 from app.modules.user.model import RefreshToken
 
 settings = get_settings()
-pwd_context = CryptContext(
-    schemes=["argon2"],
-    argon2__time_cost=2,
-    argon2__memory_cost=102400,
-    argon2__parallelism=8
-)
+
+
+def build_pwd_context(time_cost: int, memory_cost: int, parallelism: int) -> CryptContext:
+    """CryptContext de Argon2 con los parámetros dados (los de Settings, o los que se calibran)."""
+    return CryptContext(
+        schemes=["argon2"],
+        argon2__time_cost=time_cost,
+        argon2__memory_cost=memory_cost,
+        argon2__parallelism=parallelism,
+    )
+
+
+@lru_cache()
+def get_pwd_context() -> CryptContext:
+    """CryptContext con los parámetros de Settings; se arma (y carga argon2) en el primer uso."""
+    return build_pwd_context(
+        settings.argon2_time_cost,
+        settings.argon2_memory_cost,
+        settings.argon2_parallelism,
+    )
 logger = logging.getLogger(__name__)
 
+@traced()
 def hash_password(password: str) -> str:
     """Hashea la contraseña usando Argon2."""
-    return pwd_context.hash(password)
+    with metrics.PASSWORD_HASH_SECONDS.time(operation="hash"):
+        return get_pwd_context().hash(password)
 
+@traced()
 def verify_password(password: str, hashed: str) -> bool:
     """Verifica una contraseña contra su hash."""
-    return pwd_context.verify(password, hashed)
+    with metrics.PASSWORD_HASH_SECONDS.time(operation="verify"):
+        return get_pwd_context().verify(password, hashed)
+
+def password_needs_rehash(hashed: str) -> bool:
+    """True si el hash se generó con parámetros distintos a los actuales de Settings."""
+    return get_pwd_context().needs_update(hashed)
+
+
+# ======================
+# Hash en paralelo (importaciones masivas)
+# ======================
+_hash_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _hash_many(passwords: Sequence[str]) -> List[str]:
+    """Hashea un lote de contraseñas dentro de un proceso del pool."""
+    return [hash_password(password) for password in passwords]
+
+
+def _hash_worker_count() -> int:
+    return settings.password_hash_workers or os.cpu_count() or 1
+
+
+def get_hash_executor() -> ProcessPoolExecutor:
+    """Devuelve (creándolo la primera vez) el pool de procesos para Argon2."""
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ProcessPoolExecutor(max_workers=_hash_worker_count())
+    return _hash_executor
+
+
+def shutdown_hash_executor() -> None:
+    """Cierra el pool de procesos de hash si fue creado."""
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True, cancel_futures=True)
+        _hash_executor = None
+
+
+async def hash_passwords(passwords: Sequence[str]) -> List[str]:
+    """
+    Hashea muchas contraseñas repartiendo el trabajo entre todos los cores.
+    Conserva el orden de entrada y no bloquea el event loop.
+    """
+    if not passwords:
+        return []
+    executor = get_hash_executor()
+    size = max(1, -(-len(passwords) // _hash_worker_count()))
+    batches = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        *(loop.run_in_executor(executor, _hash_many, list(batch)) for batch in batches)
+    )
+    return [hashed for batch in results for hashed in batch]
 
+@traced()
 def create_token(subject: str, expires_minutes: int, token_type: str = "access") -> str:
     """Crea un JWT para un subject con expiración y tipo dados."""
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
     payload = {
         "sub": str(subject),
         "exp": expire,
-        "type": token_type
+        "type": token_type,
+        "jti": uuid.uuid4().hex,  # Evita tokens idénticos emitidos en el mismo segundo
     }
     token = jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
     return token
@@ -46,6 +127,7 @@ def create_refresh_token(subject: str) -> str:
     expires_minutes = settings.refresh_token_expire_days * 24 * 60
     return create_token(subject, expires_minutes, token_type="refresh")
 
+@traced()
 async def save_refresh_token(db: AsyncSession, token: str, user_id: int, expires_at: datetime = None) -> RefreshToken:
     if expires_at is None:
         # Usamos la configuración de días de expiración de refresh token
@@ -64,6 +146,7 @@ async def save_refresh_token(db: AsyncSession, token: str, user_id: int, expires
     return db_token
 
 
+@traced()
 async def validate_refresh_token(db: AsyncSession, token: str) -> Optional[RefreshToken]:
     """
     Valida que el token exista, no esté revocado y no haya expirado.
@@ -76,33 +159,86 @@ async def validate_refresh_token(db: AsyncSession, token: str) -> Optional[Refre
     if not db_token:
         return None
     if db_token.expires_at < datetime.utcnow():
-        db_token.revoked = True
-        await db.commit()
+        await revoke_refresh_token(db, token)
         return None
     return db_token
 
 
+@traced()
 def decode_token(token: str) -> Optional[dict]:
     """Decodifica cualquier JWT, retornando el payload o None si falla."""
     try:
         payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
         return payload
     except JWTError as e:
-        logger.warning(f"JWT decode error: {e}")
+        logger.warning(f"JWT decode error: {e}", extra={"event": "jwt_decode_failed"})
         return None
 
 
-async def revoke_refresh_token(db: AsyncSession, token: str):
-    """Revoca manualmente un token de refresco."""
-    result = await db.execute(
-        select(RefreshToken).where(RefreshToken.token == token)
+@traced()
+async def revoke_refresh_token(db: AsyncSession, token: str, user_id: Optional[int] = None) -> int:
+    """
+    Revoca un token de refresco con un único UPDATE (sin cargar la fila).
+    Si se indica user_id, el token debe pertenecer a ese usuario y en la
+    misma sentencia se revocan también sus tokens ya expirados.
+    Retorna la cantidad de tokens revocados.
+    """
+    stmt = update(RefreshToken).where(RefreshToken.revoked == False)
+    if user_id is None:
+        stmt = stmt.where(RefreshToken.token == token)
+    else:
+        stmt = stmt.where(
+            RefreshToken.user_id == user_id,
+            or_(RefreshToken.token == token, RefreshToken.expires_at < func.now()),
+        )
+    return await _execute_revoke(db, stmt)
+
+
+@traced()
+async def revoke_all_refresh_tokens(db: AsyncSession, user_id: int) -> int:
+    """
+    Revoca todos los tokens de refresco vivos de un usuario (cierra todas sus sesiones).
+    Retorna la cantidad de tokens revocados.
+    """
+    stmt = update(RefreshToken).where(
+        RefreshToken.user_id == user_id,
+        RefreshToken.revoked == False,
     )
-    db_token = result.scalars().first()
-    if db_token:
-        db_token.revoked = True
-        try:
-            await db.commit()
-        except Exception as e:
-            await db.rollback()
-            logger.error(f"Error al revocar refresh token: {e}")
-            raise
+    return await _execute_revoke(db, stmt)
+
+
+async def _execute_revoke(db: AsyncSession, stmt) -> int:
+    try:
+        result = await db.execute(
+            stmt.values(revoked=True).execution_options(synchronize_session=False)
+        )
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error al revocar refresh token: {e}")
+        raise
+    return result.rowcount
+
+
+# ======================
+# Warm-up
+# ======================
+@health.register_statements
+async def warm_up_queries(db: AsyncSession) -> None:
+    """Prepara en la conexión la búsqueda de refresh tokens (refresh / logout)."""
+    await validate_refresh_token(db, "")
+
+
+@health.register_task
+async def warm_up_crypto() -> None:
+    """
+    Un hash + verify de Argon2 (primer uso reserva memory_cost KiB) y un
+    JWT firmado y decodificado. En un hilo para no frenar el event loop.
+    """
+    def _run() -> None:
+        context = get_pwd_context()
+        hashed = context.hash("warm-up")
+        context.verify("warm-up", hashed)
+        jwt.decode(create_access_token("0"), settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+
+    await asyncio.to_thread(_run)
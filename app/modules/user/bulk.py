@@ -0,0 +1,284 @@
+"""
+Importación masiva de usuarios.
+
+Lee CSV o NDJSON en streaming (una fila por línea), valida cada fila con
+UserCreate, hashea las contraseñas en paralelo, asigna slugs por lotes y
+escribe con COPY de asyncpg en transacciones por bloque.
+
+Uso desde consola:
+
+    python -m app.modules.user.bulk usuarios.csv
+    python -m app.modules.user.bulk usuarios.ndjson --format ndjson
+"""
+import codecs
+import csv
+import json
+import logging
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import get_settings
+from app.core.helpers import generate_unique_slugs
+from app.modules.user.auth import hash_passwords
+from app.modules.user.model import User
+from app.modules.user.schema import UserCreate, BulkImportResult, BulkImportRowError
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+
+# Columnas escritas con COPY (id usa la secuencia, el resto viene de la fila)
+COPY_COLUMNS = (
+    "email",
+    "hashed_password",
+    "full_name",
+    "is_active",
+    "is_superuser",
+    "slug",
+    "created_at",
+    "updated_at",
+)
+
+
+# ======================
+# Lectura en streaming
+# ======================
+async def iter_lines(chunks: AsyncIterator[bytes], encoding: str = "utf-8") -> AsyncIterator[str]:
+    """Convierte un stream de bytes en líneas de texto sin cargarlo entero en memoria."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_records(
+    lines: AsyncIterator[str],
+    fmt: str = "csv",
+) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Parsea líneas CSV (con cabecera) o NDJSON.
+    Devuelve tuplas (fila, datos, error); las líneas vacías se ignoran.
+    Los campos CSV entre comillas con saltos de línea no están soportados.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+
+    header: Optional[List[str]] = None
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+
+        if fmt == "csv" and header is None:
+            header = [name.strip() for name in next(csv.reader([line]))]
+            continue
+
+        row += 1
+        if fmt == "ndjson":
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row, None, f"JSON inválido: {e.msg}"
+                continue
+            if not isinstance(data, dict):
+                yield row, None, "Cada línea debe ser un objeto JSON"
+                continue
+        else:
+            values = next(csv.reader([line]))
+            if len(values) != len(header):
+                yield row, None, f"Se esperaban {len(header)} columnas y llegaron {len(values)}"
+                continue
+            # Las celdas vacías se tratan como "no enviado" para usar los defaults del schema
+            data = {key: value for key, value in zip(header, values) if value != ""}
+
+        yield row, data, None
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in exc.errors()
+    )
+
+
+# ======================
+# Escritura por bloques
+# ======================
+async def _copy_users(db: AsyncSession, records: List[tuple]) -> None:
+    """Escribe filas en users con COPY usando la conexión asyncpg de la sesión."""
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        User.__tablename__,
+        records=records,
+        columns=COPY_COLUMNS,
+    )
+
+
+async def _import_chunk(
+    db: AsyncSession,
+    chunk: List[Tuple[int, UserCreate]],
+    seen_emails: set,
+    result: BulkImportResult,
+) -> None:
+    """Valida unicidad, hashea, asigna slugs y escribe un bloque en una transacción."""
+    pending: List[Tuple[int, UserCreate]] = []
+    for row, user_in in chunk:
+        email = str(user_in.email)
+        if email in seen_emails:
+            result.errors.append(BulkImportRowError(row=row, email=email, error="Email duplicado en el archivo"))
+            continue
+        seen_emails.add(email)
+        pending.append((row, user_in))
+
+    if not pending:
+        return
+
+    emails = [str(user_in.email) for _, user_in in pending]
+    existing = await db.execute(select(User.email).where(User.email.in_(emails)))
+    existing_emails = set(existing.scalars().all())
+    if existing_emails:
+        for row, user_in in pending:
+            if str(user_in.email) in existing_emails:
+                result.errors.append(BulkImportRowError(row=row, email=str(user_in.email), error="El email ya existe"))
+        pending = [(row, user_in) for row, user_in in pending if str(user_in.email) not in existing_emails]
+        if not pending:
+            await db.rollback()
+            return
+
+    hashed = await hash_passwords([user_in.password for _, user_in in pending])
+    slugs = await generate_unique_slugs(db, User, [user_in.full_name for _, user_in in pending])
+
+    now = datetime.now(timezone.utc)
+    records = [
+        (
+            str(user_in.email),
+            hashed_pw,
+            user_in.full_name,
+            user_in.is_active,
+            bool(user_in.is_superuser),
+            slug,
+            now,
+            now,
+        )
+        for (_, user_in), hashed_pw, slug in zip(pending, hashed, slugs)
+    ]
+
+    try:
+        await _copy_users(db, records)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error importando bloque de {len(records)} usuarios: {e}")
+        for row, user_in in pending:
+            result.errors.append(
+                BulkImportRowError(row=row, email=str(user_in.email), error=f"Bloque rechazado: {e}")
+            )
+        return
+
+    result.created += len(records)
+
+
+async def import_users(
+    db: AsyncSession,
+    lines: AsyncIterator[str],
+    fmt: str = "csv",
+    chunk_size: Optional[int] = None,
+    max_rows: Optional[int] = None,
+) -> BulkImportResult:
+    """
+    Importa usuarios desde un stream de líneas CSV/NDJSON.
+
+    Cada bloque de `chunk_size` filas válidas se escribe en su propia
+    transacción: un fallo en un bloque no deshace los anteriores y queda
+    reflejado fila a fila en el reporte de errores.
+    Con `max_rows` se deja de leer al superarlo: lo ya leído se importa y la
+    primera fila sobrante queda en el reporte como error.
+    """
+    chunk_size = chunk_size or settings.bulk_import_chunk_size
+    result = BulkImportResult(total=0, created=0, failed=0)
+    seen_emails: set = set()
+    chunk: List[Tuple[int, UserCreate]] = []
+
+    async for row, data, error in iter_records(lines, fmt):
+        if max_rows is not None and result.total >= max_rows:
+            result.errors.append(BulkImportRowError(
+                row=row, error=f"Máximo {max_rows} filas por importación: el resto no se procesó",
+            ))
+            break
+        result.total += 1
+        if error:
+            result.errors.append(BulkImportRowError(row=row, error=error))
+            continue
+        try:
+            user_in = UserCreate.model_validate(data)
+        except ValidationError as e:
+            email = data.get("email") if isinstance(data.get("email"), str) else None
+            result.errors.append(BulkImportRowError(row=row, email=email, error=_format_validation_error(e)))
+            continue
+
+        chunk.append((row, user_in))
+        if len(chunk) >= chunk_size:
+            await _import_chunk(db, chunk, seen_emails, result)
+            chunk = []
+
+    if chunk:
+        await _import_chunk(db, chunk, seen_emails, result)
+
+    result.errors.sort(key=lambda err: err.row)
+    result.failed = len(result.errors)
+    return result
+
+
+# ======================
+# CLI
+# ======================
+async def _file_lines(path: str) -> AsyncIterator[str]:
+    with open(path, encoding="utf-8-sig", newline="") as handle:
+        for line in handle:
+            yield line.rstrip("\r\n")
+
+
+async def _main(path: str, fmt: str, chunk_size: Optional[int]) -> BulkImportResult:
+    from app.core.database import AsyncSessionLocal, close_async_engine
+    from app.modules.user.auth import shutdown_hash_executor
+
+    try:
+        async with AsyncSessionLocal() as db:
+            return await import_users(db, _file_lines(path), fmt, chunk_size)
+    finally:
+        shutdown_hash_executor()
+        await close_async_engine()
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import time
+
+    parser = argparse.ArgumentParser(description="Importación masiva de usuarios (CSV o NDJSON)")
+    parser.add_argument("path", help="Archivo de entrada")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="Por defecto se deduce de la extensión")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Filas por transacción")
+    args = parser.parse_args()
+
+    from app.core.logger import setup_logging
+    setup_logging()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    started = time.perf_counter()
+    report = asyncio.run(_main(args.path, fmt, args.chunk_size))
+    elapsed = time.perf_counter() - started
+
+    print(report.model_dump_json(indent=2))
+    print(f"{report.created} usuarios creados en {elapsed:.1f}s ({report.total / max(elapsed, 1e-9):.0f} filas/s)")
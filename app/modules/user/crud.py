@@ -1,19 +1,35 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import or_
-from typing import Optional
+from sqlalchemy import or_, update, func, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import noload
+from typing import Optional, AsyncIterator, List, Sequence
 
-from fastapi_pagination.ext.sqlalchemy import paginate
 from app.modules.user.model import User
-from app.modules.user.schema import UserCreate, UserUpdate, UserOut
+from app.modules.user.schema import UserCreate, UserUpdate, UserOut, BulkUpdateResult
 from app.modules.user.auth import hash_password
-from app.core.helpers import generate_unique_slug, GenericPaginatedList
+from app.core.helpers import generate_unique_slug, paginate_query, GenericPaginatedList
+from app.core import cache, health
+from app.core.config import get_settings
+from app.core.tracing import traced
+
+settings = get_settings()
+
+# Namespace de caché para cualquier estado derivado de la tabla users
+USERS_CACHE = "users"
+
+# Totales del listado por filtro de búsqueda (estrategia "cached").
+# Cualquier alta, baja o cambio de usuario puede mover un total: se vacía entera.
+_count_cache = cache.register_cache(
+    cache.TTLCache(USERS_CACHE, ttl=settings.pagination_count_cache_ttl, maxsize=1000, per_row=False)
+)
 
 
 # ======================
 # Crear usuario
 # ======================
+@traced()
 async def create_user(db: AsyncSession, user_in: UserCreate) -> UserOut:
     """
     Crea un nuevo usuario.
@@ -44,6 +60,7 @@ async def create_user(db: AsyncSession, user_in: UserCreate) -> UserOut:
 # ======================
 # Obtener por ID
 # ======================
+@traced()
 async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
     result = await db.execute(select(User).where(User.id == user_id, User.is_active == True))
     user = result.scalars().first()
@@ -55,6 +72,7 @@ async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
 # ======================
 # Obtener por email
 # ======================
+@traced()
 async def get_user_by_email(db: AsyncSession, user_email: str) -> Optional[User]:
     result = await db.execute(select(User).where(User.email == user_email, User.is_active == True))
     user = result.scalars().first()
@@ -66,6 +84,7 @@ async def get_user_by_email(db: AsyncSession, user_email: str) -> Optional[User]
 # ======================
 # Obtener por slug
 # ======================
+@traced()
 async def get_user_by_slug(db: AsyncSession, slug: str) -> Optional[UserOut]:
     result = await db.execute(select(User).where(User.slug == slug, User.is_active == True))
     user = result.scalars().first()
@@ -75,16 +94,12 @@ async def get_user_by_slug(db: AsyncSession, slug: str) -> Optional[UserOut]:
 
 
 # ======================
-# Listar usuarios (paginados + búsqueda)
+# Filtro común de listados
 # ======================
-async def list_users(
-    db: AsyncSession,
-    search: Optional[str] = None,
-) -> GenericPaginatedList[UserOut]:
+def active_users_query(search: Optional[str] = None):
     """
-    Lista usuarios paginados.
-    - Solo activos.
-    - Busca por email o full_name si search está definido.
+    Query base de usuarios activos, filtrando por email o full_name si search está definido.
+    Compartida por el listado paginado y la exportación.
     """
     query = select(User).where(User.is_active == True)
     if search:
@@ -94,17 +109,74 @@ async def list_users(
                 User.full_name.ilike(f"%{search}%"),
             )
         )
+    return query
+
+
+# ======================
+# Listar usuarios (paginados + búsqueda)
+# ======================
+@traced()
+async def list_users(
+    db: AsyncSession,
+    search: Optional[str] = None,
+    page: int = 1,
+    size: Optional[int] = None,
+    count_strategy: Optional[str] = None,
+) -> GenericPaginatedList[UserOut]:
+    """
+    Lista usuarios paginados.
+    - Solo activos.
+    - Busca por email o full_name si search está definido.
+    - El total se obtiene según count_strategy (por defecto
+      `pagination_count_strategy`); la respuesta indica cuál se usó.
+    """
+    # Orden estable para paginar; lo sirve el índice parcial (created_at, id)
+    query = active_users_query(search).order_by(User.created_at, User.id)
 
-    # paginate devuelve Page[User], pero usamos UserOut para el schema
-    result = await paginate(db, query)
-    # Convertir cada item a UserOut
-    result.items = [UserOut.model_validate(u) for u in result.items]
-    return result
+    return await paginate_query(
+        db,
+        query,
+        page=page,
+        size=size or settings.pagination_default_size,
+        schema=UserOut,
+        count_strategy=count_strategy,
+        count_cache=_count_cache,
+        cache_key=("count", search or ""),
+    )
+
+
+# ======================
+# Exportar usuarios (streaming)
+# ======================
+async def stream_users(
+    db: AsyncSession,
+    search: Optional[str] = None,
+    batch_size: int = 1000,
+) -> AsyncIterator[List[UserOut]]:
+    """
+    Recorre los usuarios activos con un cursor del lado del servidor y
+    entrega lotes de `batch_size` UserOut. La memoria usada no depende
+    del tamaño de la tabla.
+    """
+    query = (
+        active_users_query(search)
+        .order_by(User.id)
+        .options(noload(User.tokens))  # La exportación no usa los refresh tokens
+        .execution_options(yield_per=batch_size)
+    )
+    result = await db.stream_scalars(query)
+    try:
+        async for partition in result.partitions():
+            # El identity map guarda referencias débiles: cada lote se libera al avanzar
+            yield [UserOut.model_validate(u) for u in partition]
+    finally:
+        await result.close()
 
 
 # ======================
 # Actualizar usuario
 # ======================
+@traced()
 async def update_user(
     db: AsyncSession,
     user: User,
@@ -139,13 +211,44 @@ async def update_user(
     except IntegrityError:
         await db.rollback()
         raise ValueError("Error al actualizar usuario")
+    cache.invalidate(USERS_CACHE, [user.id])
 
     # Devuelve solo los campos actualizables
     return UserUpdate.model_validate(user)
 
+# ======================
+# Rehash de contraseña (parámetros de Argon2 cambiados)
+# ======================
+@traced()
+async def update_password_hash(db: AsyncSession, user: User, new_hash: str) -> bool:
+    """
+    Reemplaza el hash de un usuario con un UPDATE condicionado al hash
+    anterior: si otro request ya lo cambió (ej: cambio de contraseña), no
+    se pisa. Retorna True si se actualizó.
+    """
+    stmt = (
+        update(User)
+        .where(User.id == user.id, User.hashed_password == user.hashed_password)
+        .values(hashed_password=new_hash)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        result = await db.execute(stmt)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    if not result.rowcount:
+        return False
+    user.hashed_password = new_hash
+    cache.invalidate(USERS_CACHE, [user.id])
+    return True
+
+
 # ======================
 # Borrado lógico (soft delete)
 # ======================
+@traced()
 async def delete_user(db: AsyncSession, user: User) -> UserOut:
     """
     Soft delete: cambia is_active a False.
@@ -158,4 +261,78 @@ async def delete_user(db: AsyncSession, user: User) -> UserOut:
     except Exception:
         await db.rollback()
         raise
+    cache.invalidate(USERS_CACHE, [user.id])
     return UserOut.model_validate(user)
+
+
+# ======================
+# Operaciones masivas (set-based)
+# ======================
+def _ids_param(user_ids: Sequence[int]):
+    """Un único parámetro array: `id = ANY(:ids)` usa el mismo plan sea cual sea la cantidad."""
+    return bindparam("ids", list(user_ids), type_=ARRAY(Integer))
+
+
+@traced()
+async def bulk_update_users(
+    db: AsyncSession,
+    user_ids: Sequence[int],
+    values: dict,
+    dry_run: bool = False,
+) -> BulkUpdateResult:
+    """
+    Aplica `values` a todos los usuarios de `user_ids` con un solo
+    UPDATE ... WHERE id = ANY(...) RETURNING id.
+    Solo se tocan las filas que realmente cambian de valor.
+    Con dry_run=True solo cuenta cuántas filas se verían afectadas.
+    """
+    conditions = [User.id == any_(_ids_param(user_ids))]
+    # Evita reescribir filas que ya tienen el valor pedido
+    conditions.append(or_(*[getattr(User, field) != value for field, value in values.items()]))
+
+    if dry_run:
+        result = await db.execute(select(func.count()).select_from(User).where(*conditions))
+        return BulkUpdateResult(matched=result.scalar_one(), dry_run=True)
+
+    stmt = (
+        update(User)
+        .where(*conditions)
+        .values(**values, updated_at=func.now())
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        result = await db.execute(stmt)
+        updated_ids = list(result.scalars().all())
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    cache.invalidate(USERS_CACHE, updated_ids)
+    return BulkUpdateResult(matched=len(updated_ids), ids=updated_ids)
+
+
+async def bulk_set_active(
+    db: AsyncSession,
+    user_ids: Sequence[int],
+    is_active: bool,
+    dry_run: bool = False,
+) -> BulkUpdateResult:
+    """Soft delete (is_active=False) o reactivación masiva."""
+    return await bulk_update_users(db, user_ids, {"is_active": is_active}, dry_run)
+
+
+# ======================
+# Warm-up
+# ======================
+@health.register_statements
+async def warm_up_queries(db: AsyncSession) -> None:
+    """
+    Ejecuta una vez las consultas de los endpoints calientes (/me, login,
+    detalle, slug y listado) para compilarlas y prepararlas en la conexión.
+    """
+    await get_user_by_id(db, 0)
+    await get_user_by_email(db, "")
+    await get_user_by_slug(db, "")
+    await list_users(db, page=1, size=1)
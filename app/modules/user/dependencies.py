@@ -0,0 +1,45 @@
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_async_session
+from app.modules.user import auth, crud
+
+
+async def get_current_user(
+    request: Request,
+    db: AsyncSession = Depends(get_async_session)
+):
+    """
+    Obtiene el usuario autenticado desde el header Authorization: Bearer <token>.
+    - Decodifica el JWT.
+    - Obtiene el usuario de la DB.
+    - Levanta 401 si el token es inválido o el usuario no existe.
+    """
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Token no proporcionado")
+
+    token = auth_header.split(" ")[1]
+    payload = auth.decode_token(token)
+    if not payload or payload.get("type") != "access":
+        raise HTTPException(status_code=401, detail="Token inválido")
+
+    user_id = payload.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Token inválido")
+
+    user = await crud.get_user_by_id(db, int(user_id))
+    if not user or not user.is_active:
+        raise HTTPException(status_code=401, detail="Usuario no válido")
+
+    return user
+
+
+async def get_current_superuser(current_user=Depends(get_current_user)):
+    """
+    Igual que get_current_user, pero exige is_superuser.
+    Levanta 403 si el usuario autenticado no es administrador.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Permisos insuficientes")
+    return current_user
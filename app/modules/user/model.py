@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, func, Text
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, func, Text, Index, text
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -8,7 +8,7 @@ class User(Base):
     """
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     email = Column(String(255), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     full_name = Column(String(255), nullable=True)
@@ -27,6 +27,15 @@ class User(Base):
         lazy="selectin"
     )
 
+    __table_args__ = (
+        # Índices parciales: las lecturas solo consultan usuarios activos,
+        # así los usuarios dados de baja no ocupan espacio en estos índices
+        Index("ix_users_active_id", "id", postgresql_where=text("is_active")),
+        Index("ix_users_active_email", "email", postgresql_where=text("is_active")),
+        Index("ix_users_active_slug", "slug", postgresql_where=text("is_active")),
+        Index("ix_users_active_created_at_id", "created_at", "id", postgresql_where=text("is_active")),
+    )
+
 class RefreshToken(Base):
     """
     Token para refresh de sesión de usuario.
@@ -41,3 +50,8 @@ class RefreshToken(Base):
     revoked = Column(Boolean, default=False, nullable=False)
 
     user = relationship("User", back_populates="tokens", lazy="selectin")
+
+    __table_args__ = (
+        # Índice parcial: solo tokens vivos, usado por logout/logout-all
+        Index("ix_refresh_tokens_user_id_live", "user_id", postgresql_where=text("revoked = false")),
+    )
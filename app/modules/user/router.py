@@ -1,23 +1,45 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional
+from typing import Optional, AsyncIterator
+import asyncio
+import csv
+import io
+import logging
 
-from app.core.database import get_async_session
-from app.modules.user import crud, auth
-from app.modules.user.schema import UserCreate, UserUpdate, UserOut
-from app.core.helpers import GenericPaginatedList, get_current_user
+from app.core.compression import compress
+from app.core.config import get_settings
+from app.core.database import get_async_session, AsyncSessionLocal
+from app.core.idempotency import idempotent
+from app.modules.user import crud, auth, bulk
+from app.modules.user.schema import (
+    UserCreate, UserUpdate, UserOut, BulkImportResult, LogoutRequest,
+    UserBulkIds, UserBulkUpdate, BulkUpdateResult,
+)
+from app.core.helpers import GenericPaginatedList
+from app.modules.user.dependencies import get_current_user, get_current_superuser
 from app.core.limiter import limiter  # SlowAPI rate limiter
 
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/users",
     tags=["Usuarios"]
 )
 
+EXPORT_FIELDS = list(UserOut.model_fields)
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
 # ======================
 # Crear usuario
 # ======================
 @router.post("/", response_model=UserOut)
 @limiter.limit("5/minute")
+@idempotent
 async def create_user_endpoint(
     request: Request,
     user_in: UserCreate,
@@ -25,6 +47,7 @@ async def create_user_endpoint(
 ):
     """
     Crea un usuario nuevo.
+    Acepta `Idempotency-Key`: los reintentos reciben la respuesta original.
     Rate limit: 5 requests/min.
     """
     try:
@@ -34,11 +57,40 @@ async def create_user_endpoint(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+# ======================
+# Importación masiva
+# ======================
+@router.post("/import", response_model=BulkImportResult)
+@limiter.limit("2/minute")
+async def import_users_endpoint(
+    request: Request,
+    format: Optional[str] = Query(None, description="csv o ndjson (por defecto según Content-Type)"),
+    chunk_size: Optional[int] = Query(None, ge=1, le=10000, description="Filas por transacción"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_superuser)
+):
+    """
+    Importa usuarios en bloque desde el cuerpo de la petición (CSV con cabecera o NDJSON).
+    El cuerpo se procesa en streaming; devuelve un reporte de errores por fila.
+    Requiere superusuario. Hasta `bulk_import_max_rows` filas por request.
+    Rate limit: 2 requests/min.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "json" in content_type else "csv"
+    if format not in bulk.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {format}")
+
+    lines = bulk.iter_lines(request.stream())
+    return await bulk.import_users(db, lines, format, chunk_size, max_rows=settings.bulk_import_max_rows)
+
+
 # ======================
 # Login
 # ======================
 @router.post("/login")
 @limiter.limit("10/minute")
+@idempotent(ttl=settings.idempotency_login_ttl)
 async def login_user(
     request: Request,
     email: str,
@@ -48,6 +100,9 @@ async def login_user(
     """
     Login de usuario.
     - Devuelve access token y refresh token si credenciales válidas.
+    - Acepta `Idempotency-Key`: los reintentos reciben los mismos tokens durante
+      `idempotency_login_ttl` segundos (no más, para no repetir tokens ya revocados).
+    - Si el hash usa parámetros de Argon2 anteriores, se regenera con los actuales.
     Rate limit: 10 requests/min.
     """
     user = await crud.get_user_by_email(db, email)
@@ -57,10 +112,21 @@ async def login_user(
     if not auth.verify_password(password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
 
-    access_token = auth.create_access_token(str(user.id))
-    refresh_token = auth.create_refresh_token(str(user.id))
+    # Se lee antes del rehash: si este falla, el rollback expira los atributos de `user`
+    user_id = user.id
+
+    # Hash con parámetros de Argon2 viejos: se rehashea ahora que tenemos la contraseña
+    if auth.password_needs_rehash(user.hashed_password):
+        try:
+            new_hash = await asyncio.to_thread(auth.hash_password, password)
+            await crud.update_password_hash(db, user, new_hash)
+        except Exception as e:
+            logger.warning(f"No se pudo rehashear la contraseña del usuario {user_id}: {e}")
+
+    access_token = auth.create_access_token(str(user_id))
+    refresh_token = auth.create_refresh_token(str(user_id))
     await auth.save_refresh_token(
-        db, refresh_token, user.id
+        db, refresh_token, user_id
     )
 
     return {"access_token": access_token, "refresh_token": refresh_token}
@@ -73,20 +139,32 @@ async def login_user(
 @limiter.limit("5/minute")
 async def logout_user(
     request: Request,
+    payload: LogoutRequest,
     db: AsyncSession = Depends(get_async_session),
     current_user=Depends(get_current_user)
 ):
     """
     Logout del usuario autenticado.
-    Revoca todos sus refresh tokens activos.
+    Revoca el refresh token enviado (solo si es del usuario) y, en la misma
+    sentencia, sus refresh tokens ya expirados.
     """
-    # Aquí podríamos revocar todos los refresh tokens activos
-    # Por simplicidad, si recibimos refresh token en header lo revocamos
-    token = request.headers.get("Authorization")
-    if token and token.startswith("Bearer "):
-        token_value = token.split(" ")[1]
-        await auth.revoke_refresh_token(db, token_value)
-    return {"detail": "Logout exitoso"}
+    revoked = await auth.revoke_refresh_token(db, payload.refresh_token, current_user.id)
+    return {"detail": "Logout exitoso", "revoked": revoked}
+
+
+@router.post("/logout-all")
+@limiter.limit("5/minute")
+async def logout_all_user(
+    request: Request,
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_user)
+):
+    """
+    Cierra todas las sesiones del usuario autenticado.
+    Revoca todos sus refresh tokens activos en una sola sentencia.
+    """
+    revoked = await auth.revoke_all_refresh_tokens(db, current_user.id)
+    return {"detail": "Todas las sesiones cerradas", "revoked": revoked}
 
 
 # ======================
@@ -130,13 +208,74 @@ async def update_my_user(
 async def list_users_endpoint(
     request: Request,
     db: AsyncSession = Depends(get_async_session),
-    search: Optional[str] = Query(None, description="Buscar por email o nombre")
+    search: Optional[str] = Query(None, description="Buscar por email o nombre"),
+    page: int = Query(1, ge=1, description="Número de página"),
+    size: int = Query(settings.pagination_default_size, ge=1, le=settings.pagination_max_size, description="Elementos por página"),
+    count: Optional[str] = Query(
+        None,
+        pattern="^(exact|estimated|cached|none)$",
+        description="Cómo calcular total (por defecto según configuración)",
+    ),
 ):
     """
     Lista todos los usuarios (solo admins en el futuro).
+    `total_strategy` indica si total es exacto, estimado, cacheado u omitido.
     Rate limit: 10 requests/min.
     """
-    return await crud.list_users(db, search)
+    return await crud.list_users(db, search, page=page, size=size, count_strategy=count)
+
+
+async def _export_rows(
+    request: Request,
+    format: str,
+    search: Optional[str],
+) -> AsyncIterator[str]:
+    """
+    Genera el archivo de exportación lote a lote.
+    Usa su propia sesión porque la respuesta se sigue enviando después de
+    que las dependencias del endpoint ya se cerraron. Cada lote espera a
+    que el cliente consuma el anterior (backpressure de StreamingResponse)
+    y se corta si el cliente se desconecta.
+    """
+    async with AsyncSessionLocal() as db:
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+            writer.writeheader()
+            yield buffer.getvalue()
+
+        async for batch in crud.stream_users(db, search, settings.export_batch_size):
+            if await request.is_disconnected():
+                break
+            if format == "csv":
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+                writer.writerows(user.model_dump(mode="json") for user in batch)
+                yield buffer.getvalue()
+            else:
+                yield "".join(user.model_dump_json() + "\n" for user in batch)
+
+
+@router.get("/export")
+@limiter.limit("2/minute")
+@compress(level=1)  # Archivo grande en streaming: prioriza CPU sobre ratio
+async def export_users_endpoint(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson o csv"),
+    search: Optional[str] = Query(None, description="Buscar por email o nombre"),
+    current_user=Depends(get_current_superuser)
+):
+    """
+    Exporta los usuarios activos en streaming (NDJSON o CSV).
+    Aplica el mismo filtro `search` que el listado paginado.
+    Requiere superusuario.
+    Rate limit: 2 requests/min.
+    """
+    return StreamingResponse(
+        _export_rows(request, format, search),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
 
 
 @router.get("/{user_id}", response_model=UserOut)
@@ -185,3 +324,66 @@ async def delete_user_endpoint(
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     return await crud.delete_user(db, user)
+
+
+# ======================
+# Operaciones masivas (solo admins)
+# ======================
+def _check_bulk_size(ids: list) -> None:
+    if len(ids) > settings.bulk_max_ids:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Máximo {settings.bulk_max_ids} usuarios por operación",
+        )
+
+
+@router.post("/bulk/deactivate", response_model=BulkUpdateResult)
+@limiter.limit("3/minute")
+async def bulk_deactivate_endpoint(
+    request: Request,
+    payload: UserBulkIds,
+    dry_run: bool = Query(False, description="Solo contar los usuarios afectados"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_superuser)
+):
+    """
+    Soft delete masivo en una sola sentencia. Requiere superusuario.
+    """
+    _check_bulk_size(payload.ids)
+    return await crud.bulk_set_active(db, payload.ids, False, dry_run)
+
+
+@router.post("/bulk/reactivate", response_model=BulkUpdateResult)
+@limiter.limit("3/minute")
+async def bulk_reactivate_endpoint(
+    request: Request,
+    payload: UserBulkIds,
+    dry_run: bool = Query(False, description="Solo contar los usuarios afectados"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_superuser)
+):
+    """
+    Reactivación masiva en una sola sentencia. Requiere superusuario.
+    """
+    _check_bulk_size(payload.ids)
+    return await crud.bulk_set_active(db, payload.ids, True, dry_run)
+
+
+@router.patch("/bulk", response_model=BulkUpdateResult)
+@limiter.limit("3/minute")
+async def bulk_update_endpoint(
+    request: Request,
+    payload: UserBulkUpdate,
+    dry_run: bool = Query(False, description="Solo contar los usuarios afectados"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_superuser)
+):
+    """
+    Actualización masiva de campos (is_active, is_superuser) en una sola sentencia.
+    Requiere superusuario.
+    """
+    _check_bulk_size(payload.ids)
+    values = payload.model_dump(exclude={"ids"}, exclude_none=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="No hay campos para actualizar")
+    return await crud.bulk_update_users(db, payload.ids, values, dry_run)
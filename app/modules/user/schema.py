@@ -40,6 +40,13 @@ class UserLogin(BaseModel):
     password: str = Field(..., description="Contraseña para login")
 
 
+class LogoutRequest(BaseModel):
+    """
+    Para logout: refresh token de la sesión a cerrar.
+    """
+    refresh_token: str = Field(..., description="Refresh token a revocar")
+
+
 class UserUpdate(BaseModel):
     """
     Para actualizar parcialmente un usuario.
@@ -89,6 +96,59 @@ class PaginatedUserList(GenericPaginatedList[UserOut]):
     pass
 
 
+# ----------------------
+# Importación masiva
+# ----------------------
+
+class BulkImportRowError(BaseModel):
+    """
+    Error de una fila concreta dentro de una importación masiva.
+    """
+    row: int = Field(..., description="Número de fila en el archivo de entrada (1 = primera fila de datos)")
+    email: Optional[str] = Field(None, description="Email de la fila, si se pudo leer")
+    error: str = Field(..., description="Motivo por el que la fila no se importó")
+
+
+class BulkImportResult(BaseModel):
+    """
+    Resumen de una importación masiva con reporte de errores por fila.
+    """
+    total: int = Field(..., description="Filas leídas")
+    created: int = Field(..., description="Usuarios creados")
+    failed: int = Field(..., description="Filas rechazadas")
+    errors: List[BulkImportRowError] = Field(default_factory=list, description="Detalle de filas rechazadas")
+
+
+# ----------------------
+# Operaciones masivas
+# ----------------------
+
+class UserBulkIds(BaseModel):
+    """
+    IDs de usuarios sobre los que aplicar una operación masiva.
+    """
+    ids: List[int] = Field(..., min_length=1, description="IDs de los usuarios afectados")
+
+
+class UserBulkUpdate(UserBulkIds):
+    """
+    Actualización masiva de campos. Solo se permiten campos sin restricciones
+    de unicidad; los que vienen nulos no se modifican.
+    """
+    is_active: Optional[bool] = Field(None, description="Estado activo")
+    is_superuser: Optional[bool] = Field(None, description="Permisos de superusuario")
+
+
+class BulkUpdateResult(BaseModel):
+    """
+    Resultado de una operación masiva.
+    En modo dry_run solo se informa cuántos usuarios se verían afectados.
+    """
+    matched: int = Field(..., description="Usuarios afectados (o que se verían afectados)")
+    ids: List[int] = Field(default_factory=list, description="IDs efectivamente modificados")
+    dry_run: bool = Field(False, description="Indica si fue solo un conteo")
+
+
 class ErrorResponse(BaseModel):
     """
     Para respuestas de error uniformes.
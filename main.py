@@ -1,13 +1,21 @@
 # main.py
+import asyncio
+import contextlib
 import logging
 from contextlib import asynccontextmanager
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from slowapi import _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
 
+from app.core import compression, draining, health, idempotency, invalidation, loopmon, metrics, profiling, server, tracing
 from app.core.config import get_settings
-from app.core.database import close_async_engine
+from app.core.database import close_async_engine, on_engine_created
+from app.core.limiter import limiter
+from app.core.logger import RequestIdMiddleware, setup_logging
+from app.modules.user.auth import shutdown_hash_executor
 from app.modules.user.router import router as user_router
 
 # ----------------------
@@ -16,9 +24,8 @@ from app.modules.user.router import router as user_router
 settings = get_settings()
 
 # ----------------------
-# Logger
+# Logger (se configura en el lifespan, no al importar)
 # ----------------------
-logging.basicConfig(level=getattr(logging, settings.log_level.upper(), logging.INFO))
 logger = logging.getLogger(settings.app_name)
 
 # ======================
@@ -29,18 +36,55 @@ async def lifespan(app: FastAPI):
     # ----------------------
     # Startup: se ejecuta al iniciar la app
     # ----------------------
+    setup_logging()  # logging estándar + loguru en un solo pipeline (ver app.core.logger)
     logger.info(f"{settings.app_name} iniciado en modo {settings.app_env}")
     
     # Aquí puedes inicializar otras cosas, ej: cache, colas, servicios externos
     # await init_cache()
     # await init_external_services()
 
+    # Tareas de fondo del worker
+    background_tasks = []
+
+    # Warm-up en segundo plano: /health/live responde ya, /health/ready al terminar
+    background_tasks.append(asyncio.create_task(health.run_warmup(), name="warmup"))
+
+    # Invalidaciones de caché de otros workers (LISTEN/NOTIFY, solo Postgres)
+    if settings.cache_invalidation_enabled:
+        listener_task = invalidation.start_listener()
+        if listener_task is not None:
+            background_tasks.append(listener_task)
+
+    # SIGTERM: drenar requests en curso antes de que uvicorn cierre el socket
+    draining.install_signal_handler()
+
+    # Snapshot periódico de métricas para agregarlas entre workers
+    if settings.metrics_enabled and settings.metrics_dir:
+        background_tasks.append(asyncio.create_task(metrics.flush_periodically()))
+
+    # Limpieza de claves de idempotencia vencidas
+    if settings.idempotency_enabled:
+        background_tasks.append(asyncio.create_task(idempotency.purge_periodically()))
+
+    # Monitor de lag del event loop
+    if settings.loop_monitor_enabled:
+        background_tasks.append(loopmon.start_monitor())
+
     yield  # La app queda lista para recibir requests
 
     # ----------------------
     # Shutdown: se ejecuta al cerrar la app
     # ----------------------
+    await draining.drain()  # Espera a los requests en curso (hasta drain_timeout)
+    for task in background_tasks:
+        task.cancel()
+    for task in background_tasks:
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    metrics.remove_snapshot()
+    shutdown_hash_executor()  # Cerramos el pool de procesos de Argon2 (si se usó)
     await close_async_engine()  # Cerramos motor de BD
+    tracing.shutdown()  # Exporta los spans pendientes
     logger.info(f"{settings.app_name} finalizado y motor de BD cerrado")
 
 # ======================
@@ -55,6 +99,56 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# ======================
+# Rate limiting
+# ======================
+app.state.limiter = limiter
+
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    route = request.scope.get("route")
+    metrics.RATE_LIMIT_REJECTIONS.inc(route=getattr(route, "path", request.url.path))
+    return _rate_limit_exceeded_handler(request, exc)
+
+
+# ======================
+# Idempotency-Key en los POST marcados con @idempotent (guarda la respuesta sin comprimir)
+# ======================
+if settings.idempotency_enabled:
+    app.add_middleware(idempotency.IdempotencyMiddleware)
+
+# ======================
+# Compresión (gzip / brotli / zstd); el documento OpenAPI se comprime una vez
+# ======================
+if settings.compression_enabled:
+    app.add_middleware(
+        compression.CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        level=settings.compression_level,
+        cached_paths=[app.openapi_url],
+    )
+
+# ======================
+# Métricas
+# ======================
+if settings.metrics_enabled:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# ======================
+# Profiler SQL (opt-in)
+# ======================
+if settings.sql_profile_enabled:
+    on_engine_created(profiling.install)  # Al crearse el motor (primer uso)
+    app.add_middleware(profiling.SQLProfilerMiddleware)
+
+# ======================
+# Tracing (opt-in)
+# ======================
+if settings.tracing_enabled:
+    on_engine_created(tracing.install)
+    app.add_middleware(tracing.TracingMiddleware)
+
 # ======================
 # Configuración CORS
 # ======================
@@ -72,6 +166,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ======================
+# Request ID para los logs
+# ======================
+app.add_middleware(RequestIdMiddleware)
+
+# ======================
+# Requests en curso / drenado (el más externo)
+# ======================
+app.add_middleware(draining.InFlightMiddleware)
+
 # ======================
 # Routers
 # ======================
@@ -81,14 +185,24 @@ app.include_router(
     tags=["Usuarios"]
 )
 
+app.include_router(health.router, prefix=settings.api_prefix, tags=["Observabilidad"])
+if settings.metrics_enabled:
+    app.include_router(metrics.router, prefix=settings.api_prefix, tags=["Observabilidad"])
+app.include_router(loopmon.router, prefix=settings.api_prefix, tags=["Observabilidad"])
+
 # ======================
 # Ejecución directa (uvicorn)
 # ======================
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host=settings.server_host,
-        port=settings.server_port,
-        reload=settings.debug,  # Recarga automática en dev
-        log_level=settings.log_level.lower()
-    )
+    setup_logging()  # El supervisor loguea antes de que los workers corran el lifespan
+    if settings.debug:
+        uvicorn.run(
+            "main:app",
+            host=settings.server_host,
+            port=settings.server_port,
+            reload=True,  # Recarga automática en dev
+            log_level=settings.log_level.lower()
+        )
+    else:
+        # Producción: supervisor con N workers, uvloop/httptools y la app precargada
+        server.run(app)
@@ -6,6 +6,7 @@ import asyncio
 from app.core.config import get_settings
 from app.core.database import Base
 from app.modules.user.model import User, RefreshToken  # Importa tus modelos aquí
+from app.core.idempotency import IdempotencyKey
 
 # Configuración de Alembic
 config = context.config
@@ -0,0 +1,226 @@
+"""
+Operaciones de migración seguras para tablas grandes (users, refresh_tokens).
+
+Un ALTER TABLE con lock fuerte que queda esperando detrás de una
+transacción larga bloquea a todos los que llegan después (logins
+incluidos). Estos helpers evitan esos locks o los acotan:
+
+- `run_guarded`: ejecuta la operación con `lock_timeout` corto fuera de la
+  transacción de la migración y reintenta si no consigue el lock.
+- `create_index_concurrently` / `drop_index_concurrently`: índices sin
+  bloquear escrituras; si un intento anterior dejó un índice INVALID, se
+  borra y se vuelve a crear.
+- `backfill`: UPDATE por lotes (un commit por lote, pausa entre lotes).
+  Reanudable: el filtro `where` excluye las filas ya procesadas, así que
+  volver a correr la migración sigue donde quedó.
+- `set_not_null`: CHECK (col IS NOT NULL) NOT VALID, VALIDATE (no bloquea
+  lecturas ni escrituras) y recién entonces SET NOT NULL, que en Postgres
+  12+ usa el CHECK validado y no escanea la tabla. `add_not_null_check`
+  agrega solo el CHECK.
+- `add_check_not_valid` / `validate_constraint` para cualquier CHECK.
+
+Orden típico para una columna NOT NULL nueva (ver c745cbea483a):
+add_column nullable -> backfill -> índices -> set_not_null.
+El CHECK va después del backfill: mientras corre, la versión de la app ya
+desplegada no escribe la columna y un CHECK previo rechazaría sus INSERT y
+los UPDATE de filas todavía en NULL. Una vez agregado, las escrituras sin
+valor fallan: la versión que completa la columna tiene que estar
+desplegada antes de llegar a set_not_null (si no, separarlo en otra
+revisión posterior al deploy).
+
+Con un motor que no es Postgres se ejecutan las operaciones comunes.
+Requieren modo online (no sirven con `alembic upgrade --sql`).
+
+Ajustes por variables de entorno: MIGRATION_LOCK_TIMEOUT (ej: "3s"),
+MIGRATION_LOCK_ATTEMPTS, MIGRATION_BATCH_SIZE, MIGRATION_BATCH_PAUSE (segundos).
+"""
+import logging
+import os
+import time
+from typing import Callable, Optional, Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger("alembic.online")
+
+LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "3s")
+LOCK_ATTEMPTS = int(os.getenv("MIGRATION_LOCK_ATTEMPTS", "10"))
+BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "5000"))
+BATCH_PAUSE = float(os.getenv("MIGRATION_BATCH_PAUSE", "0.05"))
+
+LOCK_NOT_AVAILABLE = "55P03"  # SQLSTATE de lock_timeout vencido
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _require_online() -> None:
+    if op.get_context().as_sql:
+        raise RuntimeError("Esta migración necesita modo online (no soporta --sql)")
+
+
+# ======================
+# Locks acotados
+# ======================
+def run_guarded(
+    operation: Union[str, Callable[[], None]],
+    lock_timeout: str = LOCK_TIMEOUT,
+    attempts: int = LOCK_ATTEMPTS,
+) -> None:
+    """
+    Ejecuta `operation` (SQL o función que llama a `op.*`) en autocommit con
+    `lock_timeout`. Si no obtiene el lock a tiempo se reintenta con espera
+    creciente: mejor fallar rápido y reintentar que encolar a todos detrás.
+    """
+    run = operation if callable(operation) else (lambda: op.execute(operation))
+    if not _is_postgres():
+        run()
+        return
+
+    _require_online()
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        for attempt in range(1, attempts + 1):
+            bind.exec_driver_sql(f"SET lock_timeout = '{lock_timeout}'")
+            try:
+                run()
+                return
+            except OperationalError as e:
+                if getattr(e.orig, "pgcode", None) != LOCK_NOT_AVAILABLE or attempt == attempts:
+                    raise
+                logger.warning(f"Lock no disponible (intento {attempt}/{attempts}), reintentando")
+                time.sleep(min(2 ** attempt * 0.1, 10))
+            finally:
+                bind.exec_driver_sql("RESET lock_timeout")
+
+
+# ======================
+# Índices
+# ======================
+def _index_is_invalid(name: str) -> bool:
+    result = op.get_bind().execute(
+        sa.text(
+            "SELECT NOT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+        ),
+        {"name": name},
+    )
+    return bool(result.scalar())
+
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: Sequence[str],
+    unique: bool = False,
+    where: Optional[str] = None,
+) -> None:
+    """CREATE [UNIQUE] INDEX CONCURRENTLY IF NOT EXISTS, limpiando restos inválidos."""
+    kwargs = {"postgresql_where": sa.text(where)} if where else {}
+    if not _is_postgres():
+        op.create_index(name, table, columns, unique=unique, if_not_exists=True, **kwargs)
+        return
+
+    if _index_is_invalid(name):
+        logger.warning(f"Índice {name} inválido (intento anterior interrumpido): se recrea")
+        drop_index_concurrently(name, table)
+    run_guarded(lambda: op.create_index(
+        name, table, columns, unique=unique, if_not_exists=True,
+        postgresql_concurrently=True, **kwargs,
+    ))
+
+
+def drop_index_concurrently(name: str, table: str) -> None:
+    if not _is_postgres():
+        op.drop_index(name, table_name=table, if_exists=True)
+        return
+    run_guarded(lambda: op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True))
+
+
+# ======================
+# Constraints
+# ======================
+def _constraint_exists(name: str) -> bool:
+    result = op.get_bind().execute(
+        sa.text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": name}
+    )
+    return result.scalar() is not None
+
+
+def add_check_not_valid(table: str, name: str, condition: str) -> None:
+    """Agrega un CHECK que rige para filas nuevas sin revisar las existentes."""
+    if not _is_postgres() or _constraint_exists(name):
+        return
+    run_guarded(f"ALTER TABLE {table} ADD CONSTRAINT {name} CHECK ({condition}) NOT VALID")
+
+
+def validate_constraint(table: str, name: str) -> None:
+    """Revisa las filas existentes con SHARE UPDATE EXCLUSIVE (no bloquea lecturas ni escrituras)."""
+    if not _is_postgres():
+        return
+    run_guarded(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+
+
+def _not_null_check_name(table: str, column: str) -> str:
+    return f"ck_{table}_{column}_not_null"
+
+
+def add_not_null_check(table: str, column: str) -> None:
+    add_check_not_valid(table, _not_null_check_name(table, column), f"{column} IS NOT NULL")
+
+
+def set_not_null(table: str, column: str) -> None:
+    """SET NOT NULL sin escaneo largo bajo ACCESS EXCLUSIVE (usa un CHECK validado)."""
+    if not _is_postgres():
+        op.alter_column(table, column, nullable=False)
+        return
+    name = _not_null_check_name(table, column)
+    add_check_not_valid(table, name, f"{column} IS NOT NULL")
+    validate_constraint(table, name)
+    run_guarded(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL")
+    run_guarded(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}")
+
+
+# ======================
+# Backfill
+# ======================
+def backfill(
+    table: str,
+    set_clause: str,
+    where: str,
+    key: str = "id",
+    batch_size: int = BATCH_SIZE,
+    pause: float = BATCH_PAUSE,
+) -> int:
+    """
+    UPDATE {table} SET {set_clause} para las filas que cumplen `where`, en
+    lotes de `batch_size` ordenados por `key` (entero) y con un commit por lote.
+    `where` debe dejar de cumplirse una vez actualizada la fila: es lo que
+    hace que el backfill sea reanudable. Retorna las filas actualizadas.
+    """
+    _require_online()
+    statement = sa.text(
+        f"UPDATE {table} SET {set_clause} WHERE {key} IN ("
+        f"SELECT {key} FROM {table} WHERE {key} > :last AND ({where}) "
+        f"ORDER BY {key} LIMIT :batch_size) RETURNING {key}"
+    )
+    total, batches = 0, 0
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        # Arranca desde la primera fila pendiente (None = no hay nada que hacer)
+        last = bind.execute(sa.text(f"SELECT min({key}) - 1 FROM {table} WHERE {where}")).scalar()
+        while last is not None:
+            keys = bind.execute(statement, {"last": last, "batch_size": batch_size}).scalars().all()
+            if not keys:
+                break
+            total += len(keys)
+            last = max(keys)
+            batches += 1
+            if batches % 20 == 0:
+                logger.info(f"Backfill {table}: {total} filas (último {key} = {last})")
+            time.sleep(pause)
+    logger.info(f"Backfill {table} terminado: {total} filas")
+    return total
@@ -0,0 +1,35 @@
+"""Indice parcial de refresh tokens vivos
+
+Revision ID: 3b8e1f6a9c24
+Revises: d70ecf0bed5c
+Create Date: 2026-10-19 10:12:40.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations import helpers
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e1f6a9c24'
+down_revision: Union[str, Sequence[str], None] = 'd70ecf0bed5c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    helpers.create_index_concurrently(
+        'ix_refresh_tokens_user_id_live',
+        'refresh_tokens',
+        ['user_id'],
+        where='revoked = false',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    helpers.drop_index_concurrently('ix_refresh_tokens_user_id_live', 'refresh_tokens')
@@ -0,0 +1,39 @@
+"""Indices parciales de usuarios activos
+
+Revision ID: 7c2d5e9f1a36
+Revises: 3b8e1f6a9c24
+Create Date: 2026-10-19 11:04:18.772519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations import helpers
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2d5e9f1a36'
+down_revision: Union[str, Sequence[str], None] = '3b8e1f6a9c24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    helpers.create_index_concurrently('ix_users_active_id', 'users', ['id'], where='is_active')
+    helpers.create_index_concurrently('ix_users_active_email', 'users', ['email'], where='is_active')
+    helpers.create_index_concurrently('ix_users_active_slug', 'users', ['slug'], where='is_active')
+    helpers.create_index_concurrently('ix_users_active_created_at_id', 'users', ['created_at', 'id'], where='is_active')
+    # La PK ya tiene su propio índice único; ix_users_id era redundante
+    helpers.drop_index_concurrently(op.f('ix_users_id'), 'users')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    helpers.create_index_concurrently(op.f('ix_users_id'), 'users', ['id'])
+    helpers.drop_index_concurrently('ix_users_active_created_at_id', 'users')
+    helpers.drop_index_concurrently('ix_users_active_slug', 'users')
+    helpers.drop_index_concurrently('ix_users_active_email', 'users')
+    helpers.drop_index_concurrently('ix_users_active_id', 'users')
@@ -0,0 +1,51 @@
+"""Triggers de NOTIFY para invalidar caches
+
+Revision ID: b9e4d1c7a2f5
+Revises: a4f7c3d2b819
+Create Date: 2026-10-19 13:52:47.106258
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations import helpers
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e4d1c7a2f5'
+down_revision: Union[str, Sequence[str], None] = 'a4f7c3d2b819'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Emite NOTIFY cache_invalidation, '<namespace>' una vez por sentencia (ver
+# app/core/invalidation.py): un UPDATE masivo de N filas no encola N eventos,
+# y Postgres descarta los NOTIFY idénticos dentro de una misma transacción.
+# Argumento del trigger: namespace a invalidar completo.
+NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION notify_cache_invalidation() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('cache_invalidation', TG_ARGV[0]);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(NOTIFY_FUNCTION)
+    # CREATE TRIGGER toma SHARE ROW EXCLUSIVE (frena escrituras): con lock_timeout y reintentos
+    helpers.run_guarded(
+        "CREATE TRIGGER users_cache_invalidation "
+        "AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users "
+        "FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_invalidation('users')"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    helpers.run_guarded("DROP TRIGGER IF EXISTS users_cache_invalidation ON users")
+    op.execute("DROP FUNCTION IF EXISTS notify_cache_invalidation()")
@@ -10,6 +10,8 @@ from typing import Sequence, Union
 from alembic import op
 import sqlalchemy as sa
 
+from migrations import helpers
+
 
 # revision identifiers, used by Alembic.
 revision: str = 'c745cbea483a'
@@ -20,15 +22,27 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     """Upgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.add_column('users', sa.Column('slug', sa.String(length=255), nullable=False))
-    op.create_index(op.f('ix_users_slug'), 'users', ['slug'], unique=True)
-    # ### end Alembic commands ###
+    # Columna nullable: solo toca el catálogo, sin reescribir la tabla.
+    # Se crea ya como VARCHAR(100) (el tipo final de d70ecf0bed5c) para no reescribirla después.
+    helpers.run_guarded(lambda: op.add_column(
+        'users', sa.Column('slug', sa.String(length=100), nullable=True), if_not_exists=True
+    ))
+    # Las filas existentes se completan por lotes. Sin CHECK todavía: la versión
+    # de la app ya desplegada no conoce la columna y sus INSERT / UPDATE deben seguir pasando.
+    # Slug derivado del nombre (o del email) con el id como sufijo: único sin consultar
+    helpers.backfill(
+        'users',
+        "slug = concat_ws('-', nullif(trim(both '-' from left(regexp_replace("
+        "lower(coalesce(nullif(full_name, ''), split_part(email, '@', 1))), "
+        "'[^a-z0-9]+', '-', 'g'), 80)), ''), id)",
+        where='slug IS NULL',
+    )
+    helpers.create_index_concurrently(op.f('ix_users_slug'), 'users', ['slug'], unique=True)
+    # Recién ahora el CHECK NOT VALID + VALIDATE + SET NOT NULL (dentro de set_not_null)
+    helpers.set_not_null('users', 'slug')
 
 
 def downgrade() -> None:
     """Downgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_index(op.f('ix_users_slug'), table_name='users')
-    op.drop_column('users', 'slug')
-    # ### end Alembic commands ###
+    helpers.drop_index_concurrently(op.f('ix_users_slug'), 'users')
+    helpers.run_guarded(lambda: op.drop_column('users', 'slug'))
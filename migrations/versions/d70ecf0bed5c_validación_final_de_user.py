@@ -11,6 +11,8 @@ from alembic import op
 import sqlalchemy as sa
 from sqlalchemy.dialects import postgresql
 
+from migrations import helpers
+
 # revision identifiers, used by Alembic.
 revision: str = 'd70ecf0bed5c'
 down_revision: Union[str, Sequence[str], None] = 'c745cbea483a'
@@ -20,25 +22,32 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     """Upgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.alter_column('users', 'slug',
-               existing_type=sa.VARCHAR(length=255),
-               type_=sa.String(length=100),
-               existing_nullable=False)
-    op.alter_column('users', 'updated_at',
-               existing_type=postgresql.TIMESTAMP(timezone=True),
-               nullable=False)
-    # ### end Alembic commands ###
+    # c745cbea483a ya crea slug como VARCHAR(100): aquí es solo catálogo. En bases que
+    # corrieron la versión anterior (VARCHAR(255)) reduce el largo y reescribe la tabla,
+    # por eso va con lock_timeout y reintentos.
+    helpers.run_guarded(lambda: op.alter_column(
+        'users', 'slug',
+        existing_type=sa.VARCHAR(length=255),
+        type_=sa.String(length=100),
+        existing_nullable=False,
+    ))
+    # Backfill sin CHECK previo (la app desplegada puede no escribir updated_at);
+    # set_not_null agrega el CHECK, lo valida y fija el NOT NULL.
+    helpers.backfill('users', 'updated_at = created_at', where='updated_at IS NULL')
+    helpers.set_not_null('users', 'updated_at')
 
 
 def downgrade() -> None:
     """Downgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.alter_column('users', 'updated_at',
-               existing_type=postgresql.TIMESTAMP(timezone=True),
-               nullable=True)
-    op.alter_column('users', 'slug',
-               existing_type=sa.String(length=100),
-               type_=sa.VARCHAR(length=255),
-               existing_nullable=False)
-    # ### end Alembic commands ###
+    # Quitar NOT NULL y agrandar un VARCHAR solo tocan el catálogo
+    helpers.run_guarded(lambda: op.alter_column(
+        'users', 'updated_at',
+        existing_type=postgresql.TIMESTAMP(timezone=True),
+        nullable=True,
+    ))
+    helpers.run_guarded(lambda: op.alter_column(
+        'users', 'slug',
+        existing_type=sa.String(length=100),
+        type_=sa.VARCHAR(length=255),
+        existing_nullable=False,
+    ))
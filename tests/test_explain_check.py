@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import get_settings
+from tools import explain_check
+
+settings = get_settings()
+
+
+async def _postgres_reachable(url: str) -> bool:
+    engine = create_async_engine(url)
+    try:
+        async with engine.connect():
+            return True
+    except Exception:
+        return False
+    finally:
+        await engine.dispose()
+
+
+def test_crud_queries_use_partial_indexes():
+    # Necesita un Postgres migrado (alembic upgrade head): los índices son parte de lo que se verifica
+    url = settings.database_url_async
+    if make_url(url).get_backend_name() != "postgresql":
+        pytest.skip("DATABASE_URL no es Postgres")
+    if not asyncio.run(_postgres_reachable(url)):
+        pytest.skip("Postgres no disponible")
+
+    assert asyncio.run(explain_check.run()) == []
@@ -0,0 +1,19 @@
+import pytest
+
+from tools import importtime
+
+# El presupuesto en ms depende de la máquina: se controla con `python -m tools.importtime`.
+# Acá solo lo determinista: que cada módulo importe primero en un proceso limpio
+# (un ciclo de imports falla) y que no cargue argon2 / asyncpg.
+
+
+@pytest.mark.parametrize("module", [
+    "main",
+    "app.core.helpers",
+    "app.modules.user.crud",
+    "app.modules.user.dependencies",
+])
+def test_import_is_acyclic_and_lazy(module):
+    _, modules = importtime.measure(module)
+    forbidden = importtime.DEFAULT_FORBIDDEN.split(",")
+    assert [name for name in forbidden if name in modules] == []
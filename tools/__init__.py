@@ -0,0 +1,4 @@
+"""
+Herramientas de desarrollo y operación (chequeos, benchmarks, cargas).
+Se ejecutan con `python -m tools.<nombre>` desde la raíz del proyecto.
+"""
@@ -0,0 +1,195 @@
+"""
+Microbenchmarks de los caminos calientes de auth y serialización.
+
+No necesita base de datos ni servicios: solo importa los módulos de la app.
+Cada benchmark se calibra para durar al menos `--min-time` segundos por
+repetición y se repite `--repeat` veces; se reporta el tiempo por operación.
+
+Uso:
+
+    python -m tools.bench                                # corre todo
+    python -m tools.bench -k token -k slugify            # filtra por nombre
+    python -m tools.bench --output bench/baseline.json   # guarda resultados
+    python -m tools.bench --compare bench/baseline.json --threshold 0.15
+
+Con --compare, el proceso termina con código 1 si la mediana de algún
+benchmark empeora más que `--threshold` (fracción) respecto de la base.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import get_settings
+from app.core.helpers import GenericPaginatedList, slugify
+from app.modules.user import auth
+from app.modules.user.model import User
+from app.modules.user.schema import UserOut
+
+settings = get_settings()
+
+PASSWORD = "contraseña-de-benchmark"
+PAGE_SIZE = 50
+
+
+# ======================
+# Datos de prueba
+# ======================
+def _make_user(i: int) -> User:
+    now = datetime.now(timezone.utc)
+    return User(
+        id=i,
+        email=f"usuario{i}@example.com",
+        hashed_password="x",
+        full_name=f"Usuario Número {i}",
+        is_active=True,
+        is_superuser=False,
+        slug=f"usuario-numero-{i}",
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def _build_benchmarks() -> Dict[str, Callable[[], object]]:
+    hashed = auth.hash_password(PASSWORD)
+    token = auth.create_access_token("42")
+    user = _make_user(1)
+    users = [_make_user(i) for i in range(PAGE_SIZE)]
+    page_model = GenericPaginatedList[UserOut]
+
+    return {
+        "auth.hash_password": lambda: auth.hash_password(PASSWORD),
+        "auth.verify_password": lambda: auth.verify_password(PASSWORD, hashed),
+        "auth.create_token": lambda: auth.create_access_token("42"),
+        "auth.decode_token": lambda: auth.decode_token(token),
+        "helpers.slugify": lambda: slugify("José María Pérez-Núñez de la Cruz"),
+        "UserOut.model_validate": lambda: UserOut.model_validate(user),
+        f"UserOut.model_validate[list {PAGE_SIZE}]": lambda: [UserOut.model_validate(u) for u in users],
+        f"GenericPaginatedList[{PAGE_SIZE}]": lambda: page_model(
+            total=10_000,
+            total_strategy="estimated",
+            page=1,
+            has_next=True,
+            size=PAGE_SIZE,
+            items=[UserOut.model_validate(u) for u in users],
+        ).model_dump_json(),
+    }
+
+
+# ======================
+# Medición
+# ======================
+def _calibrate(fn: Callable[[], object], min_time: float) -> int:
+    """Cantidad de iteraciones para que una repetición dure al menos min_time."""
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return iterations
+        # Estimación con margen; como mínimo duplicar
+        iterations = max(iterations * 2, int(iterations * min_time / max(elapsed, 1e-9) * 1.2))
+
+
+def run_benchmark(fn: Callable[[], object], repeat: int, min_time: float) -> dict:
+    fn()  # warm-up
+    iterations = _calibrate(fn, min_time)
+    per_op: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        per_op.append((time.perf_counter() - start) / iterations)
+    return {
+        "iterations": iterations,
+        "repeat": repeat,
+        "min": min(per_op),
+        "median": statistics.median(per_op),
+        "mean": statistics.fmean(per_op),
+        "stdev": statistics.stdev(per_op) if len(per_op) > 1 else 0.0,
+        "ops_per_sec": 1 / statistics.median(per_op),
+    }
+
+
+def _format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.2f} ns"
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Devuelve los benchmarks cuya mediana empeoró más que threshold."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = result["median"] / base["median"]
+        marker = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            marker = "  <-- REGRESIÓN"
+        print(f"  {name:40s} {_format_time(base['median'])} -> {_format_time(result['median'])}  x{ratio:5.2f}{marker}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks de auth y serialización")
+    parser.add_argument("-k", "--filter", action="append", default=[], help="Solo benchmarks cuyo nombre contenga este texto")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Segundos mínimos por repetición")
+    parser.add_argument("--output", help="Guarda los resultados en este JSON")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Empeoramiento tolerado (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    benchmarks = _build_benchmarks()
+    if args.filter:
+        benchmarks = {name: fn for name, fn in benchmarks.items() if any(f in name for f in args.filter)}
+
+    results: Dict[str, dict] = {}
+    for name, fn in benchmarks.items():
+        results[name] = run_benchmark(fn, args.repeat, args.min_time)
+        r = results[name]
+        print(f"{name:40s} {_format_time(r['median'])}/op  (±{r['stdev'] / r['median'] * 100:4.1f}%, {r['ops_per_sec']:,.0f} ops/s)")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "argon2": {
+                "time_cost": auth.get_pwd_context().to_dict().get("argon2__time_cost"),
+                "memory_cost": auth.get_pwd_context().to_dict().get("argon2__memory_cost"),
+                "parallelism": auth.get_pwd_context().to_dict().get("argon2__parallelism"),
+            },
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        print(f"\nComparación contra {args.compare} (umbral {args.threshold:.0%}):")
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) empeoraron: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Calibra los parámetros de Argon2 para este host.
+
+Busca el costo más alto que mantiene un verify (lo que paga cada login)
+por debajo de `--target-ms`, sin que `--concurrent-logins` hashes en
+paralelo superen `--memory-budget-mb`:
+
+1. memory_cost = presupuesto / logins concurrentes (tope `--max-memory-mb`).
+2. Si con time_cost=1 ya se pasa del objetivo, baja la memoria a la mitad
+   hasta `--min-memory-mb`.
+3. Si sobra margen, sube time_cost mientras siga por debajo del objetivo.
+
+`parallelism` por defecto es CPUs / logins concurrentes (mínimo 1): con
+todos los cores ocupados por logins, más hilos por hash solo agregan
+cambios de contexto.
+
+Uso:
+
+    python -m tools.calibrate_argon2
+    python -m tools.calibrate_argon2 --target-ms 200 --concurrent-logins 16 --memory-budget-mb 1024
+
+Imprime las variables ARGON2_* para el .env. Los hashes existentes siguen
+validando con sus parámetros y se regeneran en el siguiente login de cada
+usuario (ver `auth.password_needs_rehash`).
+"""
+import argparse
+import statistics
+import sys
+import time
+from typing import List, Optional
+
+from app.core.config import get_settings
+from app.core.server import available_cpus
+from app.modules.user import auth
+
+settings = get_settings()
+
+PASSWORD = "contraseña-de-calibración"
+MAX_TIME_COST = 10
+
+
+def _available_memory_mb() -> Optional[float]:
+    """Memoria disponible: límite del cgroup si existe, si no MemAvailable."""
+    try:
+        limit = open("/sys/fs/cgroup/memory.max").read().strip()
+        if limit != "max":
+            return int(limit) / 1024 / 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/proc/meminfo") as handle:
+            for line in handle:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def measure_verify(time_cost: int, memory_cost: int, parallelism: int, samples: int) -> float:
+    """Mediana (segundos) de `samples` verify con los parámetros dados."""
+    context = auth.build_pwd_context(time_cost, memory_cost, parallelism)
+    hashed = context.hash(PASSWORD)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.verify(PASSWORD, hashed)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def _report(label: str, time_cost: int, memory_cost: int, parallelism: int, seconds: float) -> None:
+    print(
+        f"  {label:10s} time_cost={time_cost:<2d} memory={memory_cost // 1024:>5d} MiB "
+        f"parallelism={parallelism:<2d} -> {seconds * 1000:7.1f} ms"
+    )
+
+
+def calibrate(
+    target: float,
+    memory_cost: int,
+    min_memory_cost: int,
+    parallelism: int,
+    samples: int,
+) -> tuple:
+    """Devuelve (time_cost, memory_cost, segundos por verify)."""
+    seconds = measure_verify(1, memory_cost, parallelism, samples)
+    _report("probando", 1, memory_cost, parallelism, seconds)
+    while seconds > target and memory_cost // 2 >= min_memory_cost:
+        memory_cost //= 2
+        seconds = measure_verify(1, memory_cost, parallelism, samples)
+        _report("probando", 1, memory_cost, parallelism, seconds)
+    if seconds > target:
+        return 1, memory_cost, seconds
+
+    time_cost = 1
+    while time_cost < MAX_TIME_COST:
+        candidate = measure_verify(time_cost + 1, memory_cost, parallelism, samples)
+        _report("probando", time_cost + 1, memory_cost, parallelism, candidate)
+        if candidate > target:
+            break
+        time_cost, seconds = time_cost + 1, candidate
+    return time_cost, memory_cost, seconds
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    cpus = available_cpus()
+    available_mb = _available_memory_mb()
+    default_budget = int(available_mb / 4) if available_mb else 1024
+
+    parser = argparse.ArgumentParser(description="Calibra los parámetros de Argon2 para este host")
+    parser.add_argument("--target-ms", type=float, default=250.0, help="Latencia objetivo de un verify")
+    parser.add_argument("--concurrent-logins", type=int, default=cpus, help="Logins simultáneos esperados por host")
+    parser.add_argument("--memory-budget-mb", type=int, default=default_budget, help="Memoria total para hashes en paralelo")
+    parser.add_argument("--max-memory-mb", type=int, default=256, help="Tope de memoria por hash")
+    parser.add_argument("--min-memory-mb", type=int, default=19, help="Piso de memoria por hash (OWASP: 19 MiB)")
+    parser.add_argument("--parallelism", type=int, help="Hilos por hash (por defecto CPUs / logins concurrentes)")
+    parser.add_argument("--samples", type=int, default=5, help="Verify medidos por combinación")
+    args = parser.parse_args(argv)
+
+    concurrent = max(args.concurrent_logins, 1)
+    parallelism = args.parallelism or max(1, cpus // concurrent)
+    memory_mb = min(args.memory_budget_mb // concurrent, args.max_memory_mb)
+    if memory_mb < args.min_memory_mb:
+        print(
+            f"El presupuesto ({args.memory_budget_mb} MiB para {concurrent} logins) deja "
+            f"{memory_mb} MiB por hash, menos que el piso de {args.min_memory_mb} MiB",
+            file=sys.stderr,
+        )
+        return 1
+
+    print(f"Host: {cpus} CPU(s), memoria disponible {f'{available_mb:.0f} MiB' if available_mb else 'desconocida'}")
+    print(
+        f"Objetivo: verify <= {args.target_ms:.0f} ms, {concurrent} logins concurrentes, "
+        f"{args.memory_budget_mb} MiB de presupuesto\n"
+    )
+
+    current = measure_verify(settings.argon2_time_cost, settings.argon2_memory_cost, settings.argon2_parallelism, args.samples)
+    _report("actual", settings.argon2_time_cost, settings.argon2_memory_cost, settings.argon2_parallelism, current)
+
+    target = args.target_ms / 1000
+    time_cost, memory_cost, seconds = calibrate(
+        target, memory_mb * 1024, args.min_memory_mb * 1024, parallelism, args.samples
+    )
+    _report("propuesta", time_cost, memory_cost, parallelism, seconds)
+
+    # Cada verify ocupa hasta min(parallelism, cpus) cores durante `seconds`
+    throughput = cpus / (seconds * min(parallelism, cpus))
+    print(f"\nLogins/s estimados por host con todos los cores ocupados: {throughput:,.1f}")
+    print(f"Memoria pico de Argon2 con {concurrent} logins concurrentes: {concurrent * memory_cost // 1024} MiB")
+    if seconds > target:
+        print(
+            f"Aviso: con el piso de {args.min_memory_mb} MiB no se llega a {args.target_ms:.0f} ms; "
+            "subir el objetivo o agregar CPU",
+            file=sys.stderr,
+        )
+
+    print("\nVariables para el .env:\n")
+    print(f"ARGON2_TIME_COST={time_cost}")
+    print(f"ARGON2_MEMORY_COST={memory_cost}")
+    print(f"ARGON2_PARALLELISM={parallelism}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
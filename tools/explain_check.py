@@ -0,0 +1,184 @@
+"""
+Verifica con EXPLAIN que las consultas del CRUD de usuarios usan índices.
+
+Ejecuta las funciones reales de `crud` dentro de una transacción que se
+descarta al final, captura cada sentencia SQL que emiten y la pasa por
+`EXPLAIN (FORMAT JSON)` con los mismos parámetros. Falla (exit code 1)
+si algún acceso a `users` o `refresh_tokens` no es un Index Scan o Index
+Only Scan, o si no usa el índice esperado. En `users` solo se aceptan los
+índices parciales `ix_users_active_*` (migración 7c2d5e9f1a36): si faltan,
+o el planner no los elige para el predicado `is_active`, el chequeo falla.
+
+Se fija `enable_seqscan = off` en la transacción: en una base de
+desarrollo casi vacía el planner preferiría un Seq Scan aunque exista el
+índice adecuado. No hace pasar un índice que falta: sin los parciales el
+planner cae en `users_pkey` o en los índices únicos completos, que no
+están entre los esperados.
+
+Uso:
+
+    python -m tools.explain_check
+"""
+import asyncio
+import json
+import sys
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.core.database import close_async_engine, get_engine
+from app.modules.user import crud
+from app.modules.user.model import User
+
+INDEX_NODES = {"Index Scan", "Index Only Scan"}
+
+# Índices aceptados por tabla para cada chequeo
+EXPECTED: Dict[str, Dict[str, Set[str]]] = {
+    "get_user_by_id": {
+        "users": {"ix_users_active_id"},
+        "refresh_tokens": {"ix_refresh_tokens_user_id", "ix_refresh_tokens_user_id_live"},
+    },
+    "get_user_by_email": {
+        "users": {"ix_users_active_email"},
+        "refresh_tokens": {"ix_refresh_tokens_user_id", "ix_refresh_tokens_user_id_live"},
+    },
+    "get_user_by_slug": {
+        "users": {"ix_users_active_slug"},
+        "refresh_tokens": {"ix_refresh_tokens_user_id", "ix_refresh_tokens_user_id_live"},
+    },
+    "list_users": {
+        # La página usa (created_at, id); el COUNT puede preferir el índice parcial más chico
+        "users": {"ix_users_active_created_at_id", "ix_users_active_id"},
+        "refresh_tokens": {"ix_refresh_tokens_user_id", "ix_refresh_tokens_user_id_live"},
+    },
+    "stream_users": {
+        "users": {"ix_users_active_id"},
+    },
+}
+
+
+def _scan_nodes(plan: dict) -> List[dict]:
+    """Aplana el árbol de EXPLAIN y devuelve los nodos que leen una tabla o índice."""
+    nodes = []
+    if "Relation Name" in plan or "Index Name" in plan:
+        nodes.append(plan)
+    for child in plan.get("Plans", []):
+        nodes.extend(_scan_nodes(child))
+    return nodes
+
+
+def _index_table(index_name: str) -> Optional[str]:
+    if index_name.startswith(("ix_users_", "users_")):
+        return "users"
+    if index_name.startswith(("ix_refresh_tokens_", "refresh_tokens_")):
+        return "refresh_tokens"
+    return None
+
+
+def check_plan(name: str, statement: str, plan: dict) -> List[str]:
+    """Devuelve la lista de problemas encontrados en el plan de una sentencia."""
+    problems = []
+    expected = EXPECTED[name]
+    for node in _scan_nodes(plan):
+        node_type = node["Node Type"]
+        table = node.get("Relation Name") or _index_table(node.get("Index Name", ""))
+        if table not in expected:
+            continue
+        if node_type == "Bitmap Index Scan":
+            # Ya se reporta el Bitmap Heap Scan padre
+            continue
+        if node_type not in INDEX_NODES:
+            problems.append(f"{name}: {node_type} sobre {table}\n    {statement}")
+            continue
+        index_name = node.get("Index Name")
+        if index_name not in expected[table]:
+            problems.append(
+                f"{name}: usa {index_name} sobre {table}, se esperaba uno de {sorted(expected[table])}\n    {statement}"
+            )
+    return problems
+
+
+async def _capture(
+    conn: AsyncConnection,
+    fn: Callable[[AsyncSession], Awaitable[object]],
+) -> List[Tuple[str, tuple]]:
+    """Ejecuta fn con una sesión ligada a conn y devuelve las sentencias emitidas."""
+    captured: List[Tuple[str, tuple]] = []
+
+    def before_cursor_execute(_conn, _cursor, statement, parameters, _context, _executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(conn.sync_connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        session = AsyncSession(bind=conn, expire_on_commit=False, join_transaction_mode="create_savepoint")
+        await fn(session)
+    finally:
+        event.remove(conn.sync_connection, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+
+async def _list_users(db: AsyncSession):
+    # Conteo exacto para que el COUNT(*) también pase por el chequeo
+    return await crud.list_users(db, page=2, size=1, count_strategy="exact")
+
+
+async def _stream_users(db: AsyncSession):
+    async for _ in crud.stream_users(db, batch_size=50):
+        pass
+
+
+async def run() -> List[str]:
+    problems: List[str] = []
+    async with get_engine().connect() as conn:
+        trans = await conn.begin()
+        try:
+            await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+
+            # Un usuario activo de prueba para que las cargas selectin se ejecuten
+            seed = User(
+                email="explain-check@example.com",
+                hashed_password="x",
+                full_name="Explain Check",
+                slug="explain-check",
+                is_active=True,
+            )
+            session = AsyncSession(bind=conn, join_transaction_mode="create_savepoint")
+            session.add(seed)
+            await session.flush()
+
+            checks: Dict[str, Callable[[AsyncSession], Awaitable[object]]] = {
+                "get_user_by_id": lambda db: crud.get_user_by_id(db, seed.id),
+                "get_user_by_email": lambda db: crud.get_user_by_email(db, seed.email),
+                "get_user_by_slug": lambda db: crud.get_user_by_slug(db, seed.slug),
+                "list_users": _list_users,
+                "stream_users": _stream_users,
+            }
+
+            for name, fn in checks.items():
+                statements = await _capture(conn, fn)
+                if not statements:
+                    problems.append(f"{name}: no emitió ninguna consulta")
+                for statement, parameters in statements:
+                    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                    raw = result.scalar_one()
+                    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+                    found = check_plan(name, statement, plan)
+                    problems.extend(found)
+                    status = "FAIL" if found else "ok"
+                    print(f"[{status}] {name}: {' / '.join(n['Node Type'] + ' ' + n.get('Index Name', n.get('Relation Name', '')) for n in _scan_nodes(plan))}")
+        finally:
+            await trans.rollback()
+    await close_async_engine()
+    return problems
+
+
+if __name__ == "__main__":
+    found = asyncio.run(run())
+    if found:
+        print("\nConsultas sin índice adecuado:", file=sys.stderr)
+        for problem in found:
+            print(f"  - {problem}", file=sys.stderr)
+        sys.exit(1)
+    print("\nTodas las consultas del CRUD usan índices.")
@@ -0,0 +1,85 @@
+"""
+Presupuesto de tiempo de importación (arranque en frío de workers y CLIs).
+
+Corre `python -X importtime -c "import <módulo>"` en un proceso limpio
+`--repeat` veces y compara la mediana del tiempo acumulado contra
+`--budget-ms`. También falla si al importar se cargan módulos que deben
+inicializarse recién en el primer uso (`--forbid`, por defecto el backend
+de Argon2 y el driver asyncpg).
+
+Uso:
+
+    python -m tools.importtime                          # import main
+    python -m tools.importtime --budget-ms 800 --top 30
+    python -m tools.importtime --module tools.bench --forbid ""
+
+Termina con código 1 si se pasa del presupuesto o aparece un módulo prohibido.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_FORBIDDEN = "argon2,asyncpg"
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure(module: str) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """Importa `module` en un proceso nuevo. Devuelve (ms acumulados, {módulo: (self µs, acumulado µs)})."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {module}:\n{completed.stderr[-2000:]}")
+
+    modules: Dict[str, Tuple[int, int]] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+
+    if module not in modules:
+        raise RuntimeError(f"{module} no aparece en la salida de -X importtime (¿ya estaba importado?)")
+    return modules[module][1] / 1000, modules
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Presupuesto de tiempo de importación")
+    parser.add_argument("--module", default="main", help="Módulo a importar")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Máximo para la mediana del tiempo acumulado")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Módulos más lentos a listar (tiempo propio)")
+    parser.add_argument("--forbid", default=DEFAULT_FORBIDDEN, help="Módulos que no deben cargarse al importar (separados por coma)")
+    args = parser.parse_args(argv)
+
+    runs = [measure(args.module) for _ in range(max(args.repeat, 1))]
+    timings = [total for total, _ in runs]
+    median = statistics.median(timings)
+    _, modules = min(runs, key=lambda run: abs(run[0] - median))
+
+    print(f"import {args.module}: mediana {median:.0f} ms (min {min(timings):.0f}, max {max(timings):.0f}, {len(timings)} corridas)")
+    print("\nMódulos con más tiempo propio:")
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"  {self_us / 1000:8.1f} ms  (acum. {cumulative_us / 1000:8.1f} ms)  {name}")
+
+    failed = False
+    forbidden = [name.strip() for name in args.forbid.split(",") if name.strip()]
+    loaded = [name for name in forbidden if name in modules]
+    if loaded:
+        print(f"\nSe cargan al importar (deberían ser diferidos): {', '.join(loaded)}", file=sys.stderr)
+        failed = True
+    if median > args.budget_ms:
+        print(f"\nFuera de presupuesto: {median:.0f} ms > {args.budget_ms:.0f} ms", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""
+Prueba de carga end-to-end con generador de datos sintéticos.
+
+1. `seed`: puebla una base (Postgres local descartable o SQLite de
+   reemplazo) con N usuarios y M refresh tokens usando inserciones masivas
+   (COPY en Postgres, executemany en SQLite). Todos los usuarios comparten
+   la misma contraseña para no pagar N hashes Argon2 al sembrar.
+2. `run`: levanta `main:app` con uvicorn contra esa base (rate limit
+   desactivado), lanza una mezcla de /login, /me, GET /users?search= y
+   GET /users/{id} con la concurrencia pedida y reporta throughput y
+   percentiles de latencia por ruta.
+
+Uso:
+
+    python -m tools.loadtest seed --database-url sqlite+aiosqlite:///./load.db --create-schema --users 100000
+    python -m tools.loadtest run --database-url sqlite+aiosqlite:///./load.db --users 100000 \\
+        --concurrency 64 --duration 60 --workers 4 --pool-size 10
+
+Variar --pool-size/--max-overflow/--workers sirve para dimensionar el pool
+de Settings; variar --users muestra cómo escalan list_users y los slugs.
+`--create-schema` crea las tablas (necesario con SQLite; en Postgres se
+usan las migraciones).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.core.config import get_settings
+from app.core.database import Base
+from app.modules.user import auth
+from app.modules.user.model import RefreshToken, User
+
+settings = get_settings()
+
+PASSWORD = "loadtest-password"
+EMAIL_TEMPLATE = "loaduser{}@example.com"
+SEED_CHUNK = 10_000
+
+# Mezcla por defecto: ruta -> peso relativo
+DEFAULT_MIX = {"login": 5, "me": 40, "list": 25, "get": 30}
+
+
+# ======================
+# Datos sintéticos
+# ======================
+async def _insert_rows(engine: AsyncEngine, table, columns: List[str], rows: List[tuple]) -> None:
+    """Inserción masiva: COPY en Postgres, executemany en el resto."""
+    async with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(table.name, records=rows, columns=columns)
+        else:
+            await conn.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+
+
+async def seed(database_url: str, users: int, tokens: int, create_schema: bool) -> None:
+    engine = create_async_engine(database_url)
+    if create_schema:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    hashed = auth.hash_password(PASSWORD)
+    now = datetime.now(timezone.utc)
+    started = time.perf_counter()
+
+    user_columns = ["email", "hashed_password", "full_name", "is_active", "is_superuser", "slug", "created_at", "updated_at"]
+    for start in range(0, users, SEED_CHUNK):
+        rows = [
+            (EMAIL_TEMPLATE.format(i), hashed, f"Load User {i}", i % 20 != 0, False, f"load-user-{i}", now, now)
+            for i in range(start, min(start + SEED_CHUNK, users))
+        ]
+        await _insert_rows(engine, User.__table__, user_columns, rows)
+        print(f"\rusuarios: {start + len(rows):,}/{users:,}", end="", flush=True)
+    print()
+
+    async with engine.connect() as conn:
+        low, high = (await conn.execute(select(func.min(User.id), func.max(User.id)))).one()
+
+    token_columns = ["token", "user_id", "expires_at", "revoked"]
+    for start in range(0, tokens, SEED_CHUNK):
+        count = min(SEED_CHUNK, tokens - start)
+        rows = [
+            (
+                secrets.token_urlsafe(32),
+                random.randint(low, high),
+                now + timedelta(days=random.randint(-7, 7)),
+                random.random() < 0.3,
+            )
+            for _ in range(count)
+        ]
+        await _insert_rows(engine, RefreshToken.__table__, token_columns, rows)
+        print(f"\rrefresh tokens: {start + count:,}/{tokens:,}", end="", flush=True)
+    if tokens:
+        print()
+
+    await engine.dispose()
+    elapsed = time.perf_counter() - started
+    print(f"Sembrado en {elapsed:.1f}s ({(users + tokens) / max(elapsed, 1e-9):,.0f} filas/s)")
+
+
+async def sample_user_ids(database_url: str, limit: int = 10_000) -> List[int]:
+    """Ids reales de usuarios activos, leídos de la base sembrada (sin depender del rango del seed)."""
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(select(User.id).where(User.is_active).limit(limit))
+            return list(result.scalars())
+    finally:
+        await engine.dispose()
+
+
+# ======================
+# Servidor
+# ======================
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DATABASE_URL": args.database_url,
+        "RATE_LIMIT_ENABLED": "false",
+        "APP_ENV": "loadtest",
+        "DEBUG": "false",
+        "LOG_LEVEL": "WARNING",
+        "POOL_SIZE": str(args.pool_size),
+        "MAX_OVERFLOW": str(args.max_overflow),
+        "POOL_TIMEOUT": str(args.pool_timeout),
+    }
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers),
+        "--log-level", "warning",
+        "--no-access-log",
+    ]
+    return subprocess.Popen(command, env=env)
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            # Espera al fin del warm-up para no medir el arranque en frío
+            response = await client.get(f"{settings.api_prefix}/health/ready")
+            if response.status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+
+# ======================
+# Generador de carga
+# ======================
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.exceptions: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, route: str, latency: float, status: Optional[int], exception: Optional[str] = None) -> None:
+        self.latencies[route].append(latency)
+        if status is None:
+            self.errors[route] += 1
+            self.exceptions[route][exception] += 1
+        else:
+            self.statuses[route][status] += 1
+            if status >= 400:
+                self.errors[route] += 1
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(q * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def _login(client: httpx.AsyncClient, users: int) -> httpx.Response:
+    # Solo usuarios activos (el seed desactiva los múltiplos de 20)
+    i = random.randrange(users)
+    if i % 20 == 0:
+        i = (i + 1) % users
+    return await client.post(
+        f"{settings.api_prefix}/users/users/login",
+        params={"email": EMAIL_TEMPLATE.format(i), "password": PASSWORD},
+    )
+
+
+async def drive(args, base_url: str) -> Stats:
+    users_prefix = f"{settings.api_prefix}/users/users"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    stats = Stats()
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        await wait_ready(client)
+
+        # Pool de access tokens para /me
+        tokens: List[str] = []
+        for _ in range(min(args.concurrency, 32)):
+            response = await _login(client, args.users)
+            response.raise_for_status()
+            tokens.append(response.json()["access_token"])
+
+        ids = await sample_user_ids(args.database_url)
+
+        routes = list(args.mix)
+        weights = [args.mix[r] for r in routes]
+        deadline = time.monotonic() + args.duration
+
+        async def worker() -> None:
+            while time.monotonic() < deadline:
+                route = random.choices(routes, weights)[0]
+                start = time.perf_counter()
+                status = exception = None
+                try:
+                    if route == "login":
+                        response = await _login(client, args.users)
+                    elif route == "me":
+                        response = await client.get(
+                            f"{users_prefix}/me",
+                            headers={"Authorization": f"Bearer {random.choice(tokens)}"},
+                        )
+                    elif route == "list":
+                        response = await client.get(
+                            f"{users_prefix}/",
+                            params={"search": f"loaduser{random.randrange(args.users)}"},
+                        )
+                    else:
+                        response = await client.get(f"{users_prefix}/{random.choice(ids)}")
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    exception = type(e).__name__
+                stats.record(route, time.perf_counter() - start, status, exception)
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+    return stats
+
+
+def report(stats: Stats, duration: float) -> dict:
+    summary = {}
+    print(f"\n{'ruta':8s} {'reqs':>8s} {'err':>6s} {'req/s':>9s} {'p50':>9s} {'p90':>9s} {'p99':>9s} {'max':>9s}")
+    for route in sorted(stats.latencies):
+        values = sorted(stats.latencies[route])
+        row = {
+            "requests": len(values),
+            "errors": stats.errors[route],
+            "statuses": dict(stats.statuses[route]),
+            "exceptions": dict(stats.exceptions[route]),
+            "rps": len(values) / duration,
+            "p50_ms": _percentile(values, 0.50) * 1000,
+            "p90_ms": _percentile(values, 0.90) * 1000,
+            "p99_ms": _percentile(values, 0.99) * 1000,
+            "max_ms": values[-1] * 1000,
+            "mean_ms": statistics.fmean(values) * 1000,
+        }
+        summary[route] = row
+        print(
+            f"{route:8s} {row['requests']:8d} {row['errors']:6d} {row['rps']:9.1f} "
+            f"{row['p50_ms']:7.1f}ms {row['p90_ms']:7.1f}ms {row['p99_ms']:7.1f}ms {row['max_ms']:7.1f}ms"
+        )
+    total = sum(len(v) for v in stats.latencies.values())
+    print(f"\nTotal: {total} requests en {duration:.0f}s ({total / duration:.1f} req/s)")
+    return summary
+
+
+async def run(args) -> int:
+    port = _free_port()
+    server = start_server(args, port)
+    try:
+        stats = await drive(args, f"http://127.0.0.1:{port}")
+        summary = report(stats, args.duration)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as handle:
+                json.dump({"config": {k: v for k, v in vars(args).items() if k != "func"}, "routes": summary}, handle, indent=2)
+            print(f"Resultados guardados en {args.output}")
+        return 0
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def _parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        route, _, weight = part.partition("=")
+        if route not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Ruta desconocida: {route}")
+        mix[route] = int(weight)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--database-url", default=settings.database_url_async, help="URL async de SQLAlchemy")
+
+    parser = argparse.ArgumentParser(description="Prueba de carga end-to-end")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = sub.add_parser("seed", parents=[common], help="Genera usuarios y refresh tokens sintéticos")
+    seed_parser.add_argument("--users", type=int, default=10_000)
+    seed_parser.add_argument("--tokens", type=int, default=None, help="Por defecto, 2 por usuario")
+    seed_parser.add_argument("--create-schema", action="store_true", help="Crea las tablas (útil con SQLite)")
+
+    run_parser = sub.add_parser("run", parents=[common], help="Levanta la app y genera carga")
+    run_parser.add_argument("--users", type=int, default=10_000, help="Usuarios sembrados (para elegir emails válidos)")
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--duration", type=float, default=30.0, help="Segundos")
+    run_parser.add_argument("--workers", type=int, default=1)
+    run_parser.add_argument("--pool-size", type=int, default=settings.pool_size)
+    run_parser.add_argument("--max-overflow", type=int, default=settings.max_overflow)
+    run_parser.add_argument("--pool-timeout", type=int, default=settings.pool_timeout)
+    run_parser.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX, help="ej: login=5,me=40,list=25,get=30")
+    run_parser.add_argument("--output", help="Guarda el reporte en este JSON")
+
+    args = parser.parse_args(argv)
+    if args.command == "seed":
+        tokens = args.tokens if args.tokens is not None else args.users * 2
+        asyncio.run(seed(args.database_url, args.users, tokens, args.create_schema))
+        return 0
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())